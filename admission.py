@@ -0,0 +1,159 @@
+import collections
+import os
+import threading
+import time
+
+
+class Rejected(Exception):
+    """Requisição recusada pelo controle de admissão (vira 413/429/503)."""
+
+    def __init__(self, status, reason, retry_after=None):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """`rate` fichas por segundo, acumulando até `burst`."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, amount, now):
+        """Consome `amount` fichas; retorna 0 ou quantos segundos faltam para haver fichas.
+
+        Um lote maior que `burst` custa `burst` (passa com o balde cheio).
+        """
+        amount = min(amount, self.burst)
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0
+        return (amount - self.tokens) / self.rate
+
+
+class Lane:
+    """Vagas de processamento de uma classe de carga, com fila de espera limitada."""
+
+    def __init__(self, slots, queue_size):
+        self.slots = slots
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiting = 0
+
+
+class AdmissionControl:
+    """Controle de admissão e backpressure do /receive.
+
+    Antes de decifrar, cada corpo passa por três barreiras:
+
+    - tamanho: mais de `max_blocks` blocos cifrados -> 413;
+    - taxa por parceiro: token bucket de `peer_rate` mensagens/s -> 429;
+    - fila: corpos pequenos (até `small_blocks`) e grandes têm vagas
+      separadas, cada uma com fila de espera limitada; fila cheia ou espera
+      maior que `queue_timeout` -> 503.
+
+    Com vagas separadas, uma rajada de corpos grandes não atrasa as
+    mensagens de tamanho normal. 429 e 503 trazem Retry-After.
+
+    O estado (baldes e vagas) é do processo: com vários workers cada um
+    aplica os limites por conta própria.
+
+    Streams (/receive_stream) têm vagas próprias (`stream_slots`): ficam
+    abertos enquanto a rede entrega o corpo e não podem ocupar as vagas de
+    decifragem dos corpos grandes.
+    """
+
+    def __init__(self, small_slots=None, large_slots=None, queue_size=32, max_blocks=2048,
+                 small_blocks=16, peer_rate=50.0, peer_burst=100, queue_timeout=2.0,
+                 max_peers=10000, stream_slots=None):
+        cpus = os.cpu_count() or 1
+        self.max_blocks = max_blocks
+        self.small_blocks = small_blocks
+        self.peer_rate = peer_rate
+        self.peer_burst = peer_burst
+        self.queue_timeout = queue_timeout
+        self.max_peers = max_peers
+        self._lanes = {
+            "small": Lane(small_slots or 4 * cpus, queue_size),
+            # Corpos grandes são CPU pura: no máximo uma decifragem por núcleo
+            "large": Lane(large_slots or cpus, queue_size),
+            "stream": Lane(stream_slots or 2 * cpus, queue_size),
+        }
+        self._buckets = collections.OrderedDict()
+        self._cond = threading.Condition()
+        self._stats = {"admitted": 0, "shed_size": 0, "shed_rate": 0, "shed_queue": 0}
+
+    def _count(self, name):
+        self._stats[name] += 1
+
+    def check(self, peer_key, blocks, messages=1):
+        """Barreiras de tamanho e de taxa; levanta Rejected."""
+        if blocks > self.max_blocks:
+            with self._cond:
+                self._count("shed_size")
+            raise Rejected(413, f"Mensagem grande demais ({blocks} blocos; máximo {self.max_blocks})")
+        now = time.monotonic()
+        with self._cond:
+            bucket = self._buckets.get(peer_key)
+            if bucket is None:
+                bucket = self._buckets[peer_key] = TokenBucket(self.peer_rate, self.peer_burst, now)
+                while len(self._buckets) > self.max_peers:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(peer_key)
+            wait = bucket.take(messages, now)
+            if wait:
+                self._count("shed_rate")
+        if wait:
+            raise Rejected(429, "Limite de mensagens por segundo excedido", wait)
+
+    def admit(self, peer_key, blocks, messages=1):
+        """Aplica as três barreiras; retorna a função que libera a vaga ocupada."""
+        self.check(peer_key, blocks, messages)
+        lane = self._acquire(self._lanes["small" if blocks <= self.small_blocks else "large"])
+        return lambda: self._release(lane)
+
+    def admit_stream(self, peer_key):
+        """Taxa do parceiro e uma vaga de stream; o tamanho é limitado por quem lê o corpo."""
+        self.check(peer_key, 0)
+        lane = self._acquire(self._lanes["stream"])
+        return lambda: self._release(lane)
+
+    def _acquire(self, lane):
+        """Ocupa uma vaga de `lane`; levanta Rejected se não houver."""
+        with self._cond:
+            if lane.active >= lane.slots:
+                if lane.waiting >= lane.queue_size:
+                    self._count("shed_queue")
+                    raise Rejected(503, "Fila de recebimento cheia", 1)
+                lane.waiting += 1
+                try:
+                    ready = self._cond.wait_for(lambda: lane.active < lane.slots, self.queue_timeout)
+                finally:
+                    lane.waiting -= 1
+                if not ready:
+                    self._count("shed_queue")
+                    raise Rejected(503, "Tempo de espera na fila esgotado", 1)
+            lane.active += 1
+            self._count("admitted")
+        return lane
+
+    def _release(self, lane):
+        with self._cond:
+            lane.active -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            for name, lane in self._lanes.items():
+                stats[f"{name}_active"] = lane.active
+                stats[f"{name}_queue_depth"] = lane.waiting
+            stats["peers_tracked"] = len(self._buckets)
+        return stats
@@ -0,0 +1,49 @@
+"""Compara a operação privada com CRT e a exponenciação completa pow(x, d, n).
+
+Uso: python benchmarks/bench_crt.py [bits ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rsa_utils import RSAPrivateKey, generate_prime  # noqa: E402
+
+DEFAULT_BITS = [512, 1024, 2048]
+ROUNDS = 200
+
+
+def make_key(bits, e=65537):
+    """Gera uma chave do tamanho pedido (lento para tamanhos grandes)."""
+    half = bits // 2
+    while True:
+        p = generate_prime(1 << (half - 1), (1 << half) - 1)
+        q = generate_prime(1 << (half - 1), (1 << half) - 1)
+        phi = (p - 1) * (q - 1)
+        if p != q and phi % e:
+            return RSAPrivateKey(pow(e, -1, phi), p * q, p, q)
+
+
+def timeit(func, values):
+    start = time.perf_counter()
+    for value in values:
+        func(value)
+    return (time.perf_counter() - start) / len(values)
+
+
+def main(bit_sizes):
+    print(f"{'bits':>6} {'pow (ms)':>10} {'crt (ms)':>10} {'ganho':>7}")
+    for bits in bit_sizes:
+        key = make_key(bits)
+        values = [random.randrange(2, key.n) for _ in range(ROUNDS)]
+        for value in values[:10]:
+            assert key.power(value) == pow(value, key.d, key.n)
+        full = timeit(lambda x: pow(x, key.d, key.n), values)
+        crt = timeit(key.power, values)
+        print(f"{bits:>6} {full * 1000:>10.3f} {crt * 1000:>10.3f} {full / crt:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_BITS)
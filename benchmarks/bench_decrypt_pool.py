@@ -0,0 +1,47 @@
+"""Vazão de decifragem em blocos com 1..N processos (DecryptPool).
+
+Uso: python benchmarks/bench_decrypt_pool.py [--bits 2048] [--kib 64] [--rounds 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from decrypt_pool import DecryptPool  # noqa: E402
+from rsa_utils import decrypt_blocks, encrypt_blocks, generate_rsa_keys  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bits", type=int, default=2048)
+    parser.add_argument("--kib", type=int, default=64, help="tamanho da mensagem em KiB")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    public_key, private_key = generate_rsa_keys(args.bits)
+    message = "x" * (args.kib * 1024)
+    encrypted = encrypt_blocks(message, *public_key)
+    print(f"{len(encrypted)} blocos de {args.bits} bits, {os.cpu_count()} núcleos")
+    print(f"{'processos':>9} {'blocos/s':>10} {'MiB/s':>8} {'ganho':>7}")
+
+    baseline = None
+    workers = 1
+    while workers <= args.max_workers:
+        pool = DecryptPool(workers=workers, threshold=1)
+        decrypt_blocks(encrypted, private_key, pool.pow_many)  # aquece o pool
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            assert decrypt_blocks(encrypted, private_key, pool.pow_many) == message
+        elapsed = (time.perf_counter() - start) / args.rounds
+        pool.shutdown()
+        rate = len(encrypted) / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>9} {rate:>10.0f} {args.kib / 1024 / elapsed:>8.2f} {rate / baseline:>6.2f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Mede caracteres cifrados por segundo: funções soltas vs. RSAEncryptor.
+
+Uso: python benchmarks/bench_encryptor.py [--bits 2048] [--messages 2000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rsa_utils import RSAEncryptor, encrypt_blocks, encrypt_rsa, generate_rsa_keys  # noqa: E402
+
+PHRASES = ["oi", "tudo bem?", "ok", "até amanhã", "kkkk", "pode ser", "beleza!"]
+
+
+def conversation(count, seed=1):
+    """Mensagens curtas e repetitivas, como num chat real, com algumas únicas."""
+    rnd = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        if rnd.random() < 0.8:
+            messages.append(rnd.choice(PHRASES))
+        else:
+            messages.append("".join(rnd.choices(string.ascii_letters + " ", k=rnd.randint(5, 80))))
+    return messages
+
+
+def rate(func, messages):
+    chars = sum(len(message) for message in messages)
+    start = time.perf_counter()
+    for message in messages:
+        func(message)
+    return chars / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bits", type=int, default=2048)
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    (e, n), _ = generate_rsa_keys(args.bits)
+    messages = conversation(args.messages)
+    cases = [
+        ("encrypt_rsa", lambda m: encrypt_rsa(m, e, n), "encrypt_rsa"),
+        ("encrypt_blocks", lambda m: encrypt_blocks(m, e, n), "encrypt_blocks"),
+    ]
+    print(f"{'modo':>16} {'função (c/s)':>14} {'encryptor (c/s)':>16} {'ganho':>7} {'acertos':>8}")
+    for label, plain, method in cases:
+        encryptor = RSAEncryptor(e, n)
+        cached = getattr(encryptor, method)
+        for message in messages[:20]:
+            assert cached(message) == plain(message)
+        encryptor = RSAEncryptor(e, n)
+        cached = getattr(encryptor, method)
+        base = rate(plain, messages)
+        fast = rate(cached, messages)
+        hits = encryptor.hits / max(1, encryptor.hits + encryptor.misses)
+        print(f"{label:>16} {base:>14.0f} {fast:>16.0f} {fast / base:>6.2f}x {hits:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
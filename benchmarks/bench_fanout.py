@@ -0,0 +1,88 @@
+"""Latência de /send com fan-out para um número crescente de parceiros.
+
+Sobe no mesmo processo um nó remetente e até N nós receptores (threads do
+servidor do werkzeug em portas consecutivas), faz o handshake com todos e
+mede o tempo de POST /send para 1, 2, 4, ... parceiros.
+
+Uso: python benchmarks/bench_fanout.py [--peers 32] [--sends 50]
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node import create_app  # noqa: E402
+from peers import Peer  # noqa: E402
+
+
+def serve(app, port):
+    server = make_server("localhost", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--peers", type=int, default=32)
+    parser.add_argument("--sends", type=int, default=50)
+    parser.add_argument("--base-port", type=int, default=5600)
+    parser.add_argument("--key-bits", type=int, default=1024)
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    instance = tempfile.mkdtemp(prefix="chat-fanout-")
+    sender_port = args.base_port
+    sender_url = f"http://localhost:{sender_port}"
+    receivers = [
+        Peer(f"peer{i}", f"http://localhost:{sender_port + 1 + i}")
+        for i in range(args.peers)
+    ]
+
+    servers = [serve(create_app(
+        "sender", "Remetente", sender_port, receivers,
+        instance_path=instance, key_bits=args.key_bits, admission=False,
+    ), sender_port)]
+    for i, peer in enumerate(receivers):
+        servers.append(serve(create_app(
+            peer.peer_id, peer.name, sender_port + 1 + i,
+            [Peer("sender", sender_url, name="Remetente")],
+            instance_path=instance, key_bits=args.key_bits, admission=False,
+        ), sender_port + 1 + i))
+
+    session = requests.Session()
+    session.post(f"{sender_url}/init_handshake", timeout=300).raise_for_status()
+
+    print(f"{'parceiros':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'máx (ms)':>9}")
+    count = 1
+    while count <= args.peers:
+        peer_ids = [peer.peer_id for peer in receivers[:count]]
+        samples = []
+        for i in range(args.sends):
+            start = time.perf_counter()
+            response = session.post(
+                f"{sender_url}/send",
+                data={"text": f"mensagem {i}", "peer": peer_ids},
+                timeout=30,
+            )
+            samples.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(f"{count:>9} {statistics.median(samples):>9.2f} {p95:>9.2f} {samples[-1]:>9.2f}")
+        count *= 2
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Latência do handshake: completo (com e sem chave em cache) vs. retomado com ticket.
+
+Sobe Alice e Bob no mesmo processo (threads do servidor do werkzeug) e
+chama o handshake da Alice com o Bob repetidamente em cada modo.
+
+Uso: python benchmarks/bench_handshake.py [--rounds 50] [--key-bits 2048]
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node import create_app  # noqa: E402
+from peers import Peer  # noqa: E402
+
+
+def serve(app, port):
+    server = make_server("localhost", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(func, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--key-bits", type=int, default=2048)
+    parser.add_argument("--port", type=int, default=5900)
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    logging.getLogger("chat").setLevel(logging.WARNING)
+
+    instance = tempfile.mkdtemp(prefix="chat-handshake-")
+    alice_url, bob_url = f"http://localhost:{args.port}", f"http://localhost:{args.port + 1}"
+    alice_app = create_app("alice", "Alice", args.port, [Peer("bob", bob_url, name="Bob")],
+                           instance_path=instance, key_bits=args.key_bits)
+    bob_app = create_app("bob", "Bob", args.port + 1, [Peer("alice", alice_url, name="Alice")],
+                         instance_path=instance, key_bits=args.key_bits)
+    servers = [serve(alice_app, args.port), serve(bob_app, args.port + 1)]
+    alice, bob = alice_app.extensions["chat_node"], bob_app.extensions["chat_node"]
+    peer = alice.peers.get("bob")
+
+    def full_cold():
+        # Sem chaves em cache: cada lado busca o /public_key do outro
+        alice.public_key_cache.invalidate(peer.key_url)
+        bob.public_key_cache.invalidate(f"{alice_url}/public_key")
+        alice.full_handshake_with(peer)
+
+    alice.full_handshake_with(peer)  # Aquecimento (e primeiro ticket)
+    cases = [
+        ("completo, sem cache", full_cold),
+        ("completo, com cache", lambda: alice.full_handshake_with(peer)),
+        ("retomado (ticket)", lambda: alice.resume_with(peer, peer.ticket)),
+    ]
+    print(f"{'modo':>22} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    for label, func in cases:
+        p50, p95 = measure(func, args.rounds)
+        print(f"{label:>22} {p50 * 1000:>9.2f} {p95 * 1000:>9.2f}")
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
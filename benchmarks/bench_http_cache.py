@@ -0,0 +1,65 @@
+"""Custo do polling de /messages: corpo refeito, corpo em cache e revalidação (304).
+
+Usa o cliente de teste do Flask (sem rede) com um histórico de --messages
+mensagens e mede requisições por segundo e bytes por resposta em cada caso:
+
+- refeito: chega uma mensagem antes de cada GET (serializa de novo);
+- em cache: nada mudou, o corpo sai pronto do ResponseCache;
+- 304: o cliente repete a ETag que recebeu (If-None-Match).
+
+Uso: python benchmarks/bench_http_cache.py [--messages 500] [--seconds 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node import create_app  # noqa: E402
+
+
+def measure(client, headers, seconds, before=None):
+    count = size = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        if before:
+            before()
+        response = client.get("/messages", headers=headers)
+        size += len(response.data)
+        count += 1
+    return count / (time.perf_counter() - start), size / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=2)
+    args = parser.parse_args()
+
+    instance = tempfile.mkdtemp(prefix="chat-http-cache-")
+    app = create_app("bench", "Bench", 5990, instance_path=instance)
+    store = app.extensions["chat_node"].message_store
+    store.extend(("Alice", f"mensagem de teste número {i}") for i in range(args.messages))
+    client = app.test_client()
+
+    print(f"{'caso':>22} {'req/s':>9} {'bytes/resp':>11}")
+    for encoding in ("identity", "gzip"):
+        headers = {"Accept-Encoding": encoding}
+        cases = [
+            ("refeito", lambda: store.append("Alice", "nova")),
+            ("em cache", None),
+            ("304", None),
+        ]
+        for label, before in cases:
+            case_headers = dict(headers)
+            if label == "304":  # Repete a ETag da versão atual
+                case_headers["If-None-Match"] = client.get("/messages", headers=headers).headers["ETag"]
+            per_s, size = measure(client, case_headers, args.seconds, before)
+            print(f"{f'{label} ({encoding})':>22} {per_s:>9.0f} {size:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Mensagens por segundo contra um nó local: conexão nova vs. sessão com pool.
+
+Suba um nó antes, sem o controle de admissão (senão a medida vira 429):
+    CHAT_ADMISSION=0 python app2.py
+    python benchmarks/bench_http_pool.py --peer http://localhost:5001 -n 300 -c 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client  # noqa: E402
+from rsa_utils import BLOCK_MODE, encrypt_blocks  # noqa: E402
+
+
+def run(post, url, payload, total, concurrency):
+    def one(_):
+        post(url, payload).raise_for_status()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--peer", default="http://localhost:5001")
+    parser.add_argument("-n", "--messages", type=int, default=300)
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    if requests.get(f"{args.peer}/stats", timeout=5).json().get("admission"):
+        sys.exit("o nó está com controle de admissão; suba-o com CHAT_ADMISSION=0")
+    key = requests.get(f"{args.peer}/public_key", timeout=5).json()
+    payload = {"mode": BLOCK_MODE, "text": encrypt_blocks("mensagem de teste", key["e"], key["n"])}
+    url = f"{args.peer}/receive"
+
+    before = run(
+        lambda u, p: requests.post(u, json=p, timeout=5),
+        url, payload, args.messages, args.concurrency,
+    )
+    after = run(
+        lambda u, p: http_client.post(u, endpoint="receive", json=p),
+        url, payload, args.messages, args.concurrency,
+    )
+    print(f"sem pool: {before:8.1f} msg/s")
+    print(f"com pool: {after:8.1f} msg/s  ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
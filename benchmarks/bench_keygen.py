@@ -0,0 +1,43 @@
+"""Latência da geração de chaves (percentis) por tamanho de chave.
+
+Uso: python benchmarks/bench_keygen.py [--runs N] [--serial] [bits ...]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rsa_utils import generate_rsa_keys  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("bits", nargs="*", type=int, default=[1024, 2048, 3072])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--serial", action="store_true", help="sem pool de processos")
+    args = parser.parse_args()
+
+    print(f"{'bits':>6} {'média':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'máx':>8}  (s)")
+    for bits in args.bits:
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            generate_rsa_keys(bits, parallel=not args.serial)
+            samples.append(time.perf_counter() - start)
+        print(
+            f"{bits:>6} {statistics.mean(samples):>8.3f} {percentile(samples, 50):>8.3f}"
+            f" {percentile(samples, 90):>8.3f} {percentile(samples, 99):>8.3f} {max(samples):>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
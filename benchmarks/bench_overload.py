@@ -0,0 +1,129 @@
+"""Latência de mensagens normais no /receive durante uma enxurrada de corpos grandes.
+
+Sobe um nó em outro processo (wsgi.create_app no servidor do werkzeug),
+dispara corpos grandes em blocos de várias threads e, ao mesmo tempo, mede a
+latência de mensagens curtas de outro parceiro. Roda com e sem o controle
+de admissão (CHAT_ADMISSION) e mostra latências e respostas por status.
+
+Uso: python benchmarks/bench_overload.py [--flooders 16] [--flood-blocks 128] [--seconds 10]
+"""
+import argparse
+import collections
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rsa_utils import BLOCK_MODE, block_size, encrypt_blocks  # noqa: E402
+
+
+def start_node(port, instance, admission, key_bits):
+    env = dict(
+        os.environ, CHAT_NODE_ID="target", CHAT_PORT=str(port), CHAT_INSTANCE_PATH=instance,
+        CHAT_SHARED_STATE="0", CHAT_ADMISSION="1" if admission else "0",
+        CHAT_KEY_BITS=str(key_bits), CHAT_LOG_LEVEL="ERROR",
+    )
+    code = (
+        "import logging, wsgi; logging.getLogger('werkzeug').setLevel(logging.ERROR);"
+        f"wsgi.create_app().run(port={port}, threaded=True)"
+    )
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT, env=env)
+    for _ in range(600):
+        try:
+            requests.get(f"http://localhost:{port}/public_key", timeout=1).raise_for_status()
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("nó não respondeu")
+
+
+def scenario(url, args, admission, instance):
+    process = start_node(args.port, instance, admission, args.key_bits)
+    try:
+        key = requests.get(f"{url}/public_key", timeout=10).json()
+        e, n = key["e"], key["n"]
+        big_text = "x" * (block_size(n) * args.flood_blocks - 4)
+        flood_body = {"mode": BLOCK_MODE, "text": encrypt_blocks(big_text, e, n), "peer_id": "flood"}
+        normal_body = {"mode": BLOCK_MODE, "text": encrypt_blocks("oi, tudo bem?", e, n), "peer_id": "normal"}
+
+        stop = threading.Event()
+        statuses = collections.Counter()
+        lock = threading.Lock()
+
+        def flood():
+            session = requests.Session()
+            while not stop.is_set():
+                try:
+                    status = session.post(f"{url}/receive", json=flood_body, timeout=60).status_code
+                except requests.RequestException:
+                    status = "erro"
+                with lock:
+                    statuses[f"enxurrada {status}"] += 1
+
+        threads = [threading.Thread(target=flood, daemon=True) for _ in range(args.flooders)]
+        for thread in threads:
+            thread.start()
+
+        session = requests.Session()
+        latencies = []
+        deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                status = session.post(f"{url}/receive", json=normal_body, timeout=60).status_code
+            except requests.RequestException:
+                status = "erro"
+            latencies.append(time.perf_counter() - start)
+            with lock:
+                statuses[f"normal {status}"] += 1
+            time.sleep(args.interval)
+        stop.set()
+        for thread in threads:
+            thread.join(70)
+        admission_stats = requests.get(f"{url}/stats", timeout=10).json().get("admission")
+    finally:
+        process.terminate()
+        process.wait(10)
+
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "statuses": dict(statuses),
+        "admission": admission_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--flooders", type=int, default=16)
+    parser.add_argument("--flood-blocks", type=int, default=128)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=0.05, help="pausa entre mensagens normais")
+    parser.add_argument("--key-bits", type=int, default=1024)
+    parser.add_argument("--port", type=int, default=5950)
+    args = parser.parse_args()
+
+    url = f"http://localhost:{args.port}"
+    with tempfile.TemporaryDirectory(prefix="chat-overload-") as instance:
+        for admission in (False, True):
+            result = scenario(url, args, admission, instance)
+            label = "com admissão" if admission else "sem admissão"
+            print(f"{label}: p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+                  f"máx {result['max_ms']:.1f} ms")
+            print(f"    respostas: {result['statuses']}")
+            if result["admission"]:
+                print(f"    admissão: {result['admission']}")
+
+
+if __name__ == "__main__":
+    main()
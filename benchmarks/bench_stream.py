@@ -0,0 +1,106 @@
+"""Pico de memória do receptor: /receive (corpo inteiro) vs. /receive_stream (em pedaços).
+
+Sobe o Bob em outro processo (wsgi.create_app no servidor do werkzeug), faz
+o handshake a partir de uma Alice no próprio processo e entrega cargas de
+vários tamanhos. Para cada entrega o Bob é reiniciado e o pico de memória
+residente (VmHWM, só Linux) é comparado com o do processo ocioso.
+
+Uso: python benchmarks/bench_stream.py [--sizes 4 32 128] [--key-bits 2048]
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from node import MAX_BODY_BYTES, create_app  # noqa: E402
+from peers import Peer  # noqa: E402
+
+
+def peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmHWM indisponível")
+
+
+def start_bob(port, instance, key_bits, alice_url):
+    env = dict(
+        os.environ, CHAT_NODE_ID="bob", CHAT_NODE_NAME="Bob", CHAT_PORT=str(port),
+        # O /handshake só aceita parceiros registrados
+        CHAT_PEERS=f"alice={alice_url}",
+        CHAT_INSTANCE_PATH=instance, CHAT_SHARED_STATE="0", CHAT_KEY_BITS=str(key_bits),
+        CHAT_LOG_LEVEL="ERROR", CHAT_DECRYPT_PROCESSES="0", CHAT_ADMISSION="0",
+    )
+    code = (
+        "import logging, wsgi; logging.getLogger('werkzeug').setLevel(logging.ERROR);"
+        f"wsgi.create_app().run(port={port}, threaded=True)"
+    )
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT, env=env)
+    for _ in range(600):
+        try:
+            requests.get(f"http://localhost:{port}/public_key", timeout=1).raise_for_status()
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("Bob não respondeu")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[4, 32, 128], help="tamanhos em MiB")
+    parser.add_argument("--key-bits", type=int, default=2048)
+    parser.add_argument("--port", type=int, default=5960)
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    logging.getLogger("chat").setLevel(logging.WARNING)
+
+    instance = tempfile.mkdtemp(prefix="chat-stream-")
+    alice_url, bob_url = f"http://localhost:{args.port}", f"http://localhost:{args.port + 1}"
+    alice_app = create_app("alice", "Alice", args.port, [Peer("bob", bob_url, name="Bob")],
+                           instance_path=instance, key_bits=args.key_bits)
+    server = make_server("localhost", args.port, alice_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    alice = alice_app.extensions["chat_node"]
+    peer = alice.peers.get("bob")
+    path = os.path.join(instance, "carga.bin")
+
+    print(f"{'rota':>16} {'MiB':>6} {'tempo (s)':>10} {'pico extra (MiB)':>17}")
+    for size in args.sizes:
+        length = int(size * 1024 * 1024)
+        # /receive só aceita corpos até MAX_BODY_BYTES (o texto vai em base64)
+        routes = ["/receive_stream"] + (["/receive"] if length * 4 // 3 + 1024 < MAX_BODY_BYTES else [])
+        for route in routes:
+            process = start_bob(args.port + 1, instance, args.key_bits, alice_url)
+            try:
+                alice.reset_peer(peer)
+                alice.ensure_handshake(peer)
+                baseline = peak_rss_mb(process.pid)
+                start = time.perf_counter()
+                if route == "/receive":
+                    alice.deliver(peer, "x" * length)
+                else:
+                    with open(path, "wb") as f:
+                        f.truncate(length)
+                    alice.deliver_file(peer, path, "carga.bin")
+                elapsed = time.perf_counter() - start
+                extra = peak_rss_mb(process.pid) - baseline
+            finally:
+                process.terminate()
+                process.wait(10)
+            print(f"{route:>16} {size:>6g} {elapsed:>10.2f} {extra:>17.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Compara JSON e o formato binário (wire_format) para corpos em blocos.
+
+Mede tempo de serialização, de leitura e bytes enviados por corpo.
+
+Uso: python benchmarks/bench_wire_format.py [--bits 2048] [--sizes 16 256 4096] [--rounds 200]
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wire_format  # noqa: E402
+from rsa_utils import BLOCK_MODE, encrypt_blocks, generate_rsa_keys  # noqa: E402
+
+
+def timeit(func, arg, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(arg)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bits", type=int, default=2048)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 256, 4096],
+                        help="tamanhos de mensagem em caracteres")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    (e, n), _ = generate_rsa_keys(args.bits)
+    print(f"{'chars':>6} {'blocos':>6} {'formato':>8} {'bytes':>8} {'dumps (µs)':>11} {'loads (µs)':>11}")
+    for size in args.sizes:
+        text = "".join(random.choices(string.ascii_letters + " ", k=size))
+        body = {"mode": BLOCK_MODE, "text": encrypt_blocks(text, e, n), "peer_id": "alice"}
+        encoders = [
+            ("json", lambda b: json.dumps(b).encode("utf-8"), json.loads),
+            ("binário", wire_format.dumps, wire_format.loads),
+        ]
+        for label, dumps, loads in encoders:
+            data = dumps(body)
+            assert loads(data) == body
+            write = timeit(dumps, body, args.rounds)
+            read = timeit(loads, data, args.rounds)
+            print(f"{size:>6} {len(body['text']):>6} {label:>8} {len(data):>8} "
+                  f"{write * 1e6:>11.1f} {read * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Requisições por segundo de um nó servido por wsgi.py com 1, 2, 4, ... workers.
+
+Para cada número de workers sobe o servidor (gunicorn, se instalado; senão
+um prefork simples com o werkzeug: vários processos aceitando no mesmo
+socket), dispara carga de vários processos clientes por alguns segundos e
+mostra req/s e latências. Os workers compartilham o estado (CHAT_SHARED_STATE).
+
+Alvos: "receive" (POST /receive em blocos: decifragem RSA, limitada por CPU)
+e "messages" (GET /messages: leitura do histórico).
+
+Uso: python benchmarks/load_test.py [--workers 1 2 4] [--clients 8] [--seconds 10]
+                                    [--target receive|messages] [--server auto|gunicorn|prefork]
+"""
+import argparse
+import contextlib
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rsa_utils import BLOCK_MODE, encrypt_blocks  # noqa: E402
+
+
+def serve_prefork(workers, port):
+    """Modo --serve: abre o socket e cria `workers` processos servindo wsgi.create_app()."""
+    from werkzeug.serving import make_server
+    import wsgi
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", port))
+    sock.listen(1024)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            server = make_server("127.0.0.1", port, wsgi.create_app(), threaded=True, fd=sock.fileno())
+            server.serve_forever()
+            os._exit(0)
+        children.append(pid)
+
+    def stop(*_):
+        for pid in children:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+def start_server(kind, workers, port, env):
+    if kind == "gunicorn":
+        command = [
+            sys.executable, "-m", "gunicorn", "-w", str(workers), "-k", "gthread", "--threads", "8",
+            "-b", f"127.0.0.1:{port}", "--log-level", "warning", "wsgi:create_app()",
+        ]
+    else:
+        command = [sys.executable, os.path.abspath(__file__), "--serve", str(workers), "--port", str(port)]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, start_new_session=True)
+    deadline = time.monotonic() + 600  # A primeira execução gera as chaves
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/stats", timeout=1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError("servidor terminou ao iniciar")
+        time.sleep(0.2)
+    raise RuntimeError("servidor não respondeu")
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait(10)
+
+
+def client(args):
+    """Processo cliente: repete a requisição até o prazo; retorna latências e erros."""
+    url, method, body, seconds = args
+    session = requests.Session()
+    latencies, errors = [], 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, json=body, timeout=30)
+            if response.ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+    return latencies, errors
+
+
+def run_load(base_url, target, clients, seconds):
+    if target == "receive":
+        key = requests.get(f"{base_url}/public_key", timeout=10).json()
+        body = {"mode": BLOCK_MODE, "text": encrypt_blocks("carga " * 20, key["e"], key["n"]), "peer_id": "load"}
+        job = (f"{base_url}/receive", "POST", body, seconds)
+    else:
+        job = (f"{base_url}/messages?limit=50", "GET", None, seconds)
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.map(client, [job] * clients)
+    latencies = sorted(latency for samples, _ in results for latency in samples)
+    errors = sum(errors for _, errors in results)
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--target", choices=["receive", "messages"], default="receive")
+    parser.add_argument("--server", choices=["auto", "gunicorn", "prefork"], default="auto")
+    parser.add_argument("--port", type=int, default=5700)
+    parser.add_argument("--key-bits", type=int, default=2048)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_prefork(args.serve, args.port)
+        return
+
+    kind = args.server
+    if kind == "auto":
+        kind = "gunicorn" if shutil.which("gunicorn") else "prefork"
+    instance = tempfile.mkdtemp(prefix="chat-load-")
+    env = dict(
+        os.environ, CHAT_NODE_ID="load", CHAT_PORT=str(args.port), CHAT_INSTANCE_PATH=instance,
+        CHAT_KEY_BITS=str(args.key_bits), CHAT_LOG_LEVEL="WARNING", CHAT_DECRYPT_PROCESSES="0",
+        # Todos os clientes vêm do mesmo endereço: com admissão, o req/s seria o limite por parceiro
+        CHAT_ADMISSION="0",
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    print(f"servidor: {kind}, alvo: {args.target}, {args.clients} clientes, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'req/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'erros':>6}")
+    try:
+        for workers in args.workers:
+            process = start_server(kind, workers, args.port, env)
+            try:
+                latencies, errors = run_load(base_url, args.target, args.clients, args.seconds)
+            finally:
+                stop_server(process)
+            if not latencies:
+                print(f"{workers:>7} {'-':>9} {'-':>9} {'-':>9} {errors:>6}")
+                continue
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{workers:>7} {len(latencies) / args.seconds:>9.1f} "
+                  f"{statistics.median(latencies) * 1000:>9.2f} {p95 * 1000:>9.2f} {errors:>6}")
+    finally:
+        shutil.rmtree(instance, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
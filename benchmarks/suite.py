@@ -0,0 +1,329 @@
+"""Suíte de benchmarks do chat, com resultado em JSON para comparar versões.
+
+Mede geração de chaves, vazão de encrypt_rsa/decrypt_rsa e do modo em
+blocos por tamanho de mensagem, assinaturas por segundo, latência do
+handshake e latência de /send -> /receive sob carga concorrente. Para as
+medidas HTTP sobe dois nós como os de app1.py/app2.py (Alice e Bob) no
+próprio processo, com chaves num diretório temporário.
+
+    python benchmarks/suite.py --output resultado.json
+    python benchmarks/suite.py --quick --compare resultado.json   # sai com 1 se piorar
+    python benchmarks/suite.py --only crypto signatures --profile perfis/
+
+--profile grava um .prof por seção (abra com snakeviz, ou gere um flamegraph
+com flameprof); ele cobre a thread que dispara a carga. Para o lado dos
+servidores o JSON traz os spans (os mesmos de /stats) das seções HTTP, somando
+os dois nós; um flamegraph completo sai com py-spy record -- python benchmarks/suite.py.
+"""
+import argparse
+import cProfile
+import json
+import logging
+import os
+import platform
+import pstats
+import random
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from werkzeug.serving import make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from node import create_app  # noqa: E402
+from peers import Peer  # noqa: E402
+from tracing import metrics  # noqa: E402
+from rsa_utils import (  # noqa: E402
+    decrypt_blocks,
+    decrypt_rsa,
+    encrypt_blocks,
+    encrypt_rsa,
+    generate_rsa_keys,
+    sign_message,
+    verify_signature,
+)
+
+SECTIONS = ["keygen", "crypto", "signatures", "handshake", "end_to_end"]
+# Variação tolerada em --compare antes de acusar regressão
+DEFAULT_TOLERANCE = 0.10
+
+
+def percentiles(samples):
+    """p50/p95/p99/máx em milissegundos."""
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+    return {
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def rate(func, seconds):
+    """Chama func() repetidamente por `seconds`; retorna chamadas por segundo."""
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        func()
+        count += 1
+        now = time.perf_counter()
+        if now >= deadline:
+            return count / (now - start)
+
+
+def random_text(length, seed=0):
+    return "".join(random.Random(seed).choices(string.ascii_letters + " áéç", k=length))
+
+
+# --- Seções ---
+def bench_keygen(args, keys):
+    results = {}
+    for bits in args.bits:
+        samples = []
+        for _ in range(args.keygen_rounds):
+            start = time.perf_counter()
+            generate_rsa_keys(bits)
+            samples.append(time.perf_counter() - start)
+        results[str(bits)] = {"mean_ms": statistics.mean(samples) * 1000, "min_ms": min(samples) * 1000}
+    return results
+
+
+def bench_crypto(args, keys):
+    (e, n), private_key = keys
+    results = {}
+    for length in args.lengths:
+        text = random_text(length)
+        legacy = encrypt_rsa(text, e, n)
+        blocks = encrypt_blocks(text, e, n)
+        assert decrypt_rsa(legacy, private_key) == text
+        assert decrypt_blocks(blocks, private_key) == text
+        results[str(length)] = {
+            "encrypt_rsa_chars_per_s": length * rate(lambda: encrypt_rsa(text, e, n), args.seconds),
+            "decrypt_rsa_chars_per_s": length * rate(lambda: decrypt_rsa(legacy, private_key), args.seconds),
+            "encrypt_blocks_chars_per_s": length * rate(lambda: encrypt_blocks(text, e, n), args.seconds),
+            "decrypt_blocks_chars_per_s": length * rate(
+                lambda: decrypt_blocks(blocks, private_key), args.seconds
+            ),
+        }
+    return results
+
+
+def bench_signatures(args, keys):
+    public_key, private_key = keys
+    signature = sign_message("new_message", private_key)
+    assert verify_signature(signature, "new_message", public_key)
+    return {
+        "sign_per_s": rate(lambda: sign_message("new_message", private_key), args.seconds),
+        "verify_per_s": rate(lambda: verify_signature(signature, "new_message", public_key), args.seconds),
+    }
+
+
+def bench_handshake(args, nodes):
+    alice_url = nodes["alice"]
+    samples = []
+    with requests.Session() as session:
+        for _ in range(args.handshakes):
+            start = time.perf_counter()
+            session.post(f"{alice_url}/init_handshake", timeout=60).raise_for_status()
+            samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def bench_end_to_end(args, nodes):
+    alice_url, bob_url = nodes["alice"], nodes["bob"]
+    text = random_text(args.message_length)
+    local = threading.local()
+
+    def send(_):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        response = session.post(f"{alice_url}/send", data={"text": text}, timeout=60)
+        return time.perf_counter() - start, response.ok
+
+    requests.post(f"{alice_url}/send", data={"text": "aquecimento"}, timeout=60).raise_for_status()
+    last = f"{bob_url}/messages?before={2 ** 62}&limit=1"  # Última mensagem do Bob
+    before = requests.get(last, timeout=10).json()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        outcomes = list(pool.map(send, range(args.messages)))
+    elapsed = time.perf_counter() - start
+    after = requests.get(last, timeout=10).json()
+
+    samples = [latency for latency, ok in outcomes if ok]
+    result = percentiles(samples) if samples else {}
+    result.update({
+        "messages_per_s": len(samples) / elapsed,
+        "errors": len(outcomes) - len(samples),
+        "delivered": after[-1]["id"] - before[-1]["id"] if before and after else None,
+        "concurrency": args.concurrency,
+    })
+    return result
+
+
+# --- Infraestrutura ---
+def start_nodes(args, instance):
+    """Alice e Bob como em app1.py/app2.py, em threads do servidor do werkzeug."""
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    alice_port, bob_port = args.port, args.port + 1
+    configs = [
+        ("alice", "Alice", alice_port, Peer("bob", f"http://localhost:{bob_port}", name="Bob")),
+        ("bob", "Bob", bob_port, Peer("alice", f"http://localhost:{alice_port}", name="Alice")),
+    ]
+    nodes, servers = {}, []
+    for node_id, name, port, peer in configs:
+        # Sem controle de admissão: a medida é do pipeline, não do descarte de carga
+        app = create_app(node_id, name, port, [peer], instance_path=instance, key_bits=args.key_bits,
+                         admission=False)
+        app.extensions["chat_node"].key_store.get()  # Gera as chaves fora da medição
+        server = make_server("localhost", port, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        nodes[node_id] = f"http://localhost:{port}"
+        servers.append(server)
+    return nodes, servers
+
+
+def environment(args):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "key_bits": args.key_bits,
+        "quick": args.quick,
+    }
+
+
+def run_section(name, func, arg, args):
+    print(f"[{name}]", file=sys.stderr)
+    if not args.profile:
+        return func(args, arg)
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, args, arg)
+    path = os.path.join(args.profile, f"{name}.prof")
+    profiler.dump_stats(path)
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(12)
+    print(f"perfil salvo em {path}", file=sys.stderr)
+    return result
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, f"{name}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def compare(results, baseline_path, tolerance):
+    """Lista as métricas que pioraram mais que `tolerance` em relação ao baseline."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = dict(flatten(json.load(f)["results"]))
+    regressions = []
+    for name, value in flatten(results):
+        old = baseline.get(name)
+        if not old:
+            continue
+        if name.endswith("_per_s"):
+            change = (old - value) / old  # Vazão: menor é pior
+        elif name.endswith("_ms"):
+            change = (value - old) / old  # Latência: maior é pior
+        else:
+            continue
+        if change > tolerance:
+            regressions.append({"metric": name, "baseline": old, "current": value, "worse_by": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, help="seções a executar (padrão: todas)")
+    parser.add_argument("--quick", action="store_true", help="menos repetições (para CI)")
+    parser.add_argument("--key-bits", type=int, default=2048, help="chaves dos nós e das medidas de cripto")
+    parser.add_argument("--bits", type=int, nargs="+", default=[1024, 2048], help="tamanhos para keygen")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[16, 256, 4096],
+                        help="tamanhos de mensagem (caracteres)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=400)
+    parser.add_argument("--message-length", type=int, default=140)
+    parser.add_argument("--port", type=int, default=5800)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON anterior: sai com 1 se houver regressão")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--profile", metavar="DIR", help="grava um perfil cProfile por seção")
+    args = parser.parse_args()
+
+    args.seconds = 0.5 if args.quick else 2.0
+    args.keygen_rounds = 1 if args.quick else 3
+    args.handshakes = 5 if args.quick else 20
+    if args.quick:
+        args.messages = min(args.messages, 100)
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+    random.seed(args.seed)
+    sections = args.only or SECTIONS
+
+    results = {}
+    keys = generate_rsa_keys(args.key_bits)
+    for name in ("keygen", "crypto", "signatures"):
+        if name in sections:
+            results[name] = run_section(name, globals()[f"bench_{name}"], keys, args)
+
+    if "handshake" in sections or "end_to_end" in sections:
+        with tempfile.TemporaryDirectory(prefix="chat-suite-") as instance:
+            nodes, servers = start_nodes(args, instance)
+            metrics.reset()
+            try:
+                for name in ("handshake", "end_to_end"):
+                    if name in sections:
+                        results[name] = run_section(name, globals()[f"bench_{name}"], nodes, args)
+                results["server_spans"] = metrics.snapshot()
+            finally:
+                for server in servers:
+                    server.shutdown()
+
+    report = {"environment": environment(args), "results": results}
+    exit_code = 0
+    if args.compare:
+        report["regressions"] = compare(
+            {key: value for key, value in results.items() if key != "server_spans"},
+            args.compare, args.tolerance,
+        )
+        exit_code = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"resultado salvo em {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from rsa_utils import RSAPrivateKey, private_pow, private_pow_many
+
+# Chave privada residente em cada processo do pool (definida no initializer)
+_worker_key = None
+
+
+def _init_worker(d, n, p, q):
+    global _worker_key
+    _worker_key = RSAPrivateKey(d, n, p, q)
+
+
+def _pow_chunk(values):
+    return [private_pow(value, _worker_key) for value in values]
+
+
+class DecryptPool:
+    """Exponenciações privadas em paralelo para cargas grandes.
+
+    Listas com menos de `threshold` valores (mensagens comuns) continuam na
+    thread da requisição; as maiores são divididas entre `workers` processos
+    que já têm a chave privada carregada, então só os inteiros trafegam.
+    """
+
+    def __init__(self, workers=None, threshold=64):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.threshold = threshold
+        self._pool = None
+        self._pool_n = None
+        self._lock = threading.Lock()
+
+    def pow_many(self, values, private_key):
+        """Mesmo contrato de rsa_utils.private_pow_many."""
+        if (self.workers <= 1 or len(values) < self.threshold
+                or not isinstance(private_key, RSAPrivateKey)):
+            return private_pow_many(values, private_key)
+        pool = self._get_pool(private_key)
+        size = -(-len(values) // self.workers)  # divisão arredondada para cima
+        chunks = [values[i:i + size] for i in range(0, len(values), size)]
+        return [value for chunk in pool.map(_pow_chunk, chunks) for value in chunk]
+
+    def _get_pool(self, private_key):
+        with self._lock:
+            if self._pool is not None and self._pool_n != private_key.n:
+                # Chave trocada: os processos têm a chave antiga
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(private_key.d, private_key.n, private_key.p, private_key.q),
+                )
+                self._pool_n = private_key.n
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
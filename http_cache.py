@@ -0,0 +1,172 @@
+import collections
+import gzip
+import hashlib
+import os
+import threading
+
+from flask import Response, request
+
+try:
+    import brotli  # Opcional (pip install brotli); sem ele só gzip
+except ImportError:
+    brotli = None
+
+# Respostas menores que isto vão sem compressão: o ganho não paga o custo
+COMPRESS_MIN_BYTES = int(os.environ.get("CHAT_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE = {
+    "application/json", "text/html", "text/css", "text/plain", "text/javascript", "application/javascript",
+}
+# Arquivos estáticos com ?v=<hash do conteúdo> nunca mudam: cache de um ano
+STATIC_MAX_AGE = int(os.environ.get("CHAT_STATIC_MAX_AGE", str(365 * 24 * 3600)))
+
+
+def preferred_encoding():
+    """"br" ou "gzip", conforme o Accept-Encoding da requisição; None se nenhum."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, GZIP_LEVEL, mtime=0)
+
+
+class CachedBody:
+    """Corpo serializado de uma versão do recurso, com as variantes comprimidas."""
+    __slots__ = ("version", "body", "etag", "last_modified", "_variants")
+
+    def __init__(self, version, body, etag, last_modified=None):
+        self.version = version
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self._variants = {}
+
+    def variant(self, encoding):
+        """(corpo, ETag, Content-Encoding) para `encoding`; comprime uma vez por versão.
+
+        Cada variante tem ETag própria: os bytes são outros.
+        """
+        if encoding is None or len(self.body) < COMPRESS_MIN_BYTES:
+            return self.body, self.etag, None
+        data = self._variants.get(encoding)
+        if data is None:
+            data = self._variants[encoding] = compress(self.body, encoding)
+        return data, f"{self.etag}-{encoding}", encoding
+
+
+class ResponseCache:
+    """Corpos de resposta já serializados, por chave, até a versão mudar.
+
+    `version` é o que muda o corpo (o último ID do histórico, a chave
+    pública): enquanto ela é a mesma, a chave devolve os mesmos bytes (e as
+    mesmas variantes comprimidas) sem serializar de novo.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, build):
+        """CachedBody de `key` na `version`; build() -> (corpo, ETag, Last-Modified)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        # Fora do lock: corridas só serializam o mesmo corpo duas vezes
+        entry = CachedBody(version, *build())
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def cached_response(entry, mimetype="application/json", max_age=None):
+    """Resposta de um CachedBody, com compressão negociada e 304 condicional.
+
+    Sem `max_age` o cliente guarda a resposta mas revalida a cada uso
+    (no-cache): o polling vira um If-None-Match respondido com 304.
+    """
+    data, etag, encoding = entry.variant(preferred_encoding())
+    response = Response(data, mimetype=mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if len(entry.body) >= COMPRESS_MIN_BYTES:
+        response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    if entry.last_modified is not None:
+        response.last_modified = entry.last_modified
+    if max_age is None:
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+
+def compress_response(response):
+    """after_request: comprime respostas grandes que a view não comprimiu.
+
+    Ficam de fora streams (SSE), arquivos (passthrough) e o que não é texto.
+    """
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = preferred_encoding()
+    if encoding is None:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+_static_versions = {}
+
+
+def static_version(folder, filename):
+    """Hash curto do conteúdo de um arquivo estático (recalculado se o mtime mudar)."""
+    path = os.path.join(folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _static_versions.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, "rb") as f:
+            cached = _static_versions[path] = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+    return cached[1]
+
+
+def cache_static(response):
+    """after_request: arquivos estáticos pedidos com ?v= ficam em cache por STATIC_MAX_AGE."""
+    if request.endpoint == "static" and request.args.get("v") and response.status_code in (200, 304):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+    return response
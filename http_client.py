@@ -0,0 +1,83 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tracing import span
+
+# Timeouts (conexão, leitura) em segundos por tipo de chamada entre nós
+TIMEOUTS = {
+    "handshake": (2, 5),
+    "receive": (2, 5),
+    "webhook": (2, 3),
+    "public_key": (2, 3),
+    # Anexos em streaming: o parceiro decifra enquanto lê, a resposta demora mais
+    "stream": (2, 60),
+}
+DEFAULT_TIMEOUT = (2, 5)
+
+# Conexões mantidas abertas por host (keep-alive)
+POOL_SIZE = int(os.environ.get("CHAT_HTTP_POOL_SIZE", "20"))
+# CHAT_HTTP_POOLING=0 abre uma conexão nova por chamada (comportamento antigo)
+POOLING = os.environ.get("CHAT_HTTP_POOLING", "1") != "0"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def build_session():
+    """Sessão com pool de conexões e retry com backoff exponencial.
+
+    Falhas de conexão são repetidas para qualquer método (a requisição nem
+    chegou ao parceiro); erros 502/503/504 e de leitura só para GET, para não
+    duplicar mensagens em POST /receive.
+    """
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=2,
+        status=2,
+        backoff_factor=0.1,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """Sessão compartilhada entre as threads do processo.
+
+    O pool do urllib3 é thread-safe; a sessão não guarda estado por
+    requisição além dos cookies, que estes endpoints não usam.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def request(method, url, endpoint=None, **kwargs):
+    """Faz uma chamada a outro nó com o timeout do tipo `endpoint`."""
+    kwargs.setdefault("timeout", TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+    with span(f"http_{endpoint or 'other'}"):
+        if not POOLING:
+            with build_session() as session:
+                return session.request(method, url, **kwargs)
+        return get_session().request(method, url, **kwargs)
+
+
+def get(url, endpoint=None, **kwargs):
+    return request("GET", url, endpoint, **kwargs)
+
+
+def post(url, endpoint=None, **kwargs):
+    return request("POST", url, endpoint, **kwargs)
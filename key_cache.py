@@ -0,0 +1,66 @@
+import collections
+import threading
+import time
+
+import http_client
+
+
+class CachedKey:
+    """Chave pública de um parceiro guardada no cache."""
+    __slots__ = ("key", "etag", "expires_at")
+
+    def __init__(self, key, etag, expires_at):
+        self.key = key
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class PublicKeyCache:
+    """Cache de chaves públicas indexado pela URL de /public_key.
+
+    Dentro do TTL a chave vem da memória; depois disso é revalidada com
+    If-None-Match, e um 304 apenas renova o prazo. A URL vem de quem faz o
+    handshake: acima de `maxsize` URLs, as usadas há mais tempo saem.
+    """
+
+    def __init__(self, ttl=300, timeout=3, maxsize=1024):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url, refresh=False):
+        """Retorna (e, n) para a URL; levanta exceção se a busca falhar."""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+        if entry and not refresh and entry.expires_at > time.monotonic():
+            return entry.key
+
+        headers = {}
+        if entry and entry.etag and not refresh:
+            headers["If-None-Match"] = entry.etag
+        response = http_client.get(
+            url, endpoint="public_key", headers=headers, timeout=self.timeout
+        )
+
+        if response.status_code == 304 and entry:
+            entry.expires_at = time.monotonic() + self.ttl
+            return entry.key
+
+        response.raise_for_status()
+        data = response.json()
+        key = (data["e"], data["n"])
+        entry = CachedKey(key, response.headers.get("ETag"), time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return key
+
+    def invalidate(self, url):
+        with self._lock:
+            self._entries.pop(url, None)
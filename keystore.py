@@ -0,0 +1,87 @@
+import contextlib
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+from rsa_utils import MIN_KEY_BITS, RSAPrivateKey, generate_rsa_keys
+from tracing import logger
+
+
+class KeyStore:
+    """Par de chaves RSA persistido em disco e carregado sob demanda.
+
+    As chaves só são geradas quando o arquivo não existe; assim a identidade
+    do nó sobrevive a reinícios e as chaves públicas em cache dos parceiros
+    continuam válidas.
+    """
+
+    def __init__(self, path, bits=None):
+        self.path = path
+        self.bits = bits
+        self._keys = None
+        self._lock = threading.Lock()
+
+    @property
+    def public_key(self):
+        return self.get()[0]
+
+    @property
+    def private_key(self):
+        return self.get()[1]
+
+    def get(self):
+        """Retorna (chave pública, chave privada), carregando no primeiro uso."""
+        if self._keys is None:
+            with self._lock:
+                if self._keys is None:
+                    with self._file_lock():
+                        self._keys = self._load() or self._create()
+        return self._keys
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Trava entre processos: vários workers iniciando juntos geram um só par."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if data["n"].bit_length() < MIN_KEY_BITS:
+            # Chaves antigas (bits=0) não assinam handshakes nem webhooks: o nó ganha um par novo
+            logger.warning("Chaves em %s têm %d bits (mínimo %d); gerando um par novo",
+                           self.path, data["n"].bit_length(), MIN_KEY_BITS)
+            return None
+        private_key = RSAPrivateKey(data["d"], data["n"], data["p"], data["q"])
+        logger.info("Chaves carregadas de %s", self.path)
+        return (data["e"], data["n"]), private_key
+
+    def _create(self):
+        (e, n), private_key = generate_rsa_keys(self.bits)
+        data = {"e": e, "n": n, "d": private_key.d, "p": private_key.p, "q": private_key.q}
+
+        # Escrita atômica e legível só pelo dono do processo
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+        logger.info("Novas chaves geradas e salvas em %s", self.path)
+        return (e, n), private_key
@@ -0,0 +1,177 @@
+import collections
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+class Message:
+    """Mensagem armazenada; o horário fica como epoch (float)."""
+    __slots__ = ("id", "sender", "text", "timestamp")
+
+    def __init__(self, id, sender, text, timestamp):
+        self.id = id
+        self.sender = sender
+        self.text = text
+        self.timestamp = timestamp
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "sender": self.sender,
+            "text": self.text,
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(),
+        }
+
+
+class MessageStore:
+    """Histórico de mensagens: ring buffer recente + log SQLite append-only.
+
+    Toda mensagem é gravada no SQLite (que atribui o ID) e as `capacity`
+    mais recentes ficam também na memória; leituras que caem fora do ring
+    buffer vão ao disco. O histórico sobrevive a reinícios.
+
+    Com `shared=True` outros processos (workers) gravam no mesmo arquivo:
+    o ring buffer é completado com o que estiver no disco antes de cada
+    leitura, e wait() consulta o disco a cada `poll_interval` segundos.
+    """
+
+    def __init__(self, path, capacity=1000, shared=False, poll_interval=0.25):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY, sender TEXT NOT NULL,"
+            " text TEXT NOT NULL, timestamp REAL NOT NULL)"
+        )
+        # A chave primária já indexa o id; este índice cobre buscas por horário
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp, id)"
+        )
+        self._db.commit()
+
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self._recent = collections.deque(maxlen=capacity)
+        # Acordada a cada append (usada por /stream e long-poll)
+        self._cond = threading.Condition()
+        rows = self._db.execute(
+            "SELECT id, sender, text, timestamp FROM messages ORDER BY id DESC LIMIT ?",
+            (capacity,),
+        ).fetchall()
+        self._recent.extend(Message(*row) for row in reversed(rows))
+        # Com capacity=0 o ring buffer fica vazio: o último ID vem do disco
+        self._last_id = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+
+    @property
+    def latest(self):
+        """(ID, horário) da mensagem mais recente, ou (0, None): a versão do histórico."""
+        with self._cond:
+            self._sync()
+            if self._recent:
+                return self._last_id, self._recent[-1].timestamp
+            if not self._last_id:
+                return 0, None
+            row = self._db.execute("SELECT timestamp FROM messages WHERE id = ?", (self._last_id,)).fetchone()
+            return self._last_id, row[0] if row else None
+
+    def _sync(self):
+        """Traz para o ring buffer o que outros processos gravaram (com o lock)."""
+        if not self.shared:
+            return
+        added = self._query("WHERE id > ? ORDER BY id", (self._last_id,))
+        if added:
+            self._recent.extend(added)
+            self._last_id = added[-1].id
+            self._cond.notify_all()
+
+    def append(self, sender, text):
+        with self._cond:
+            timestamp = time.time()
+            cursor = self._db.execute(
+                "INSERT INTO messages (sender, text, timestamp) VALUES (?, ?, ?)",
+                (sender, text, timestamp),
+            )
+            self._db.commit()
+            message = Message(cursor.lastrowid, sender, text, timestamp)
+            if self.shared:
+                # IDs de outros workers podem ter entrado antes deste
+                self._sync()
+                return message
+            self._recent.append(message)
+            self._last_id = message.id
+            self._cond.notify_all()
+        return message
+
+    def extend(self, items):
+        """Grava vários pares (remetente, texto) numa única transação."""
+        with self._cond:
+            timestamp = time.time()
+            added = []
+            with self._db:
+                for sender, text in items:
+                    cursor = self._db.execute(
+                        "INSERT INTO messages (sender, text, timestamp) VALUES (?, ?, ?)",
+                        (sender, text, timestamp),
+                    )
+                    added.append(Message(cursor.lastrowid, sender, text, timestamp))
+            if self.shared:
+                self._sync()
+                return added
+            self._recent.extend(added)
+            if added:
+                self._last_id = added[-1].id
+                self._cond.notify_all()
+        return added
+
+    def wait(self, since, timeout):
+        """Bloqueia até existir mensagem com ID > since (ou estourar o timeout)."""
+        with self._cond:
+            if not self.shared:
+                return self._cond.wait_for(lambda: self._last_id > since, timeout=timeout)
+            deadline = time.monotonic() + timeout
+            while True:
+                self._sync()
+                remaining = deadline - time.monotonic()
+                if self._last_id > since or remaining <= 0:
+                    return self._last_id > since
+                self._cond.wait(min(remaining, self.poll_interval))
+
+    def since(self, since, limit=None):
+        """Mensagens com ID > since, em ordem crescente."""
+        with self._cond:
+            self._sync()
+            if since >= self._last_id:
+                return []
+            # IDs no ring buffer são contíguos: o índice sai direto do ID
+            if self._recent and since >= self._recent[0].id - 1:
+                start = since - self._recent[0].id + 1
+                stop = None if limit is None else start + limit
+                return list(itertools.islice(self._recent, start, stop))
+            return self._query(
+                "WHERE id > ? ORDER BY id LIMIT ?", (since, -1 if limit is None else limit)
+            )
+
+    def page(self, before=None, limit=50):
+        """Página de até `limit` mensagens anteriores ao ID `before` (ou as últimas)."""
+        with self._cond:
+            self._sync()
+            if before is None or before > self._last_id + 1:
+                before = self._last_id + 1
+            if self._recent and before - limit >= self._recent[0].id:
+                start = before - self._recent[0].id - limit
+                return list(itertools.islice(self._recent, start, start + limit))
+            rows = self._query("WHERE id < ? ORDER BY id DESC LIMIT ?", (before, limit))
+            rows.reverse()
+            return rows
+
+    def _query(self, clause, params):
+        rows = self._db.execute(
+            f"SELECT id, sender, text, timestamp FROM messages {clause}", params
+        ).fetchall()
+        return [Message(*row) for row in rows]
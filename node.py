@@ -0,0 +1,1231 @@
+import argparse
+import contextlib
+import hashlib
+import hmac
+import ipaddress
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from urllib.parse import urlparse
+
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+import http_cache
+import http_client
+from admission import AdmissionControl, Rejected
+import streaming
+import wire_format
+from decrypt_pool import DecryptPool
+from key_cache import PublicKeyCache
+from keystore import KeyStore
+from message_store import MessageStore
+from peers import Peer, PeerRegistry
+from session_crypto import SESSION_MODE, SessionCipher, SessionTable, SessionTicket, TicketIssuer
+from nonce_cache import NonceCache
+from shared_state import SharedState
+from tracing import configure_logging, logger, metrics
+from webhook_dispatcher import WebhookDispatcher
+from rsa_utils import (
+    BLOCK_MODE,
+    decrypt_rsa,
+    encrypt_blocks,
+    decrypt_blocks,
+    encrypt_bytes,
+    decrypt_bytes,
+    sign_message,
+    verify_signature,
+    key_fingerprint,
+)
+
+# Intervalo máximo de espera antes de um keep-alive / resposta vazia
+STREAM_KEEPALIVE = 15
+# Máximo de mensagens devolvidas por chamada a /messages
+MAX_PAGE = 500
+# Envios simultâneos para parceiros diferentes em /send
+FANOUT_WORKERS = int(os.environ.get("CHAT_FANOUT_WORKERS", "16"))
+# Processos para cifrar lotes em blocos (0 = na própria thread)
+BATCH_PROCESSES = int(os.environ.get("CHAT_BATCH_PROCESSES", "0"))
+# Tamanho mínimo de lote para usar o pool de processos
+BATCH_POOL_MIN = int(os.environ.get("CHAT_BATCH_POOL_MIN", "8"))
+# Processos para decifrar cargas grandes (padrão: um por núcleo; 0/1 = inline)
+DECRYPT_PROCESSES = os.environ.get("CHAT_DECRYPT_PROCESSES")
+# Blocos RSA a partir dos quais a decifragem vai para o pool de processos
+PARALLEL_DECRYPT_MIN_BLOCKS = int(os.environ.get("CHAT_PARALLEL_DECRYPT_MIN_BLOCKS", "64"))
+# "json" desliga o formato binário de wire_format nos envios
+WIRE_FORMAT = os.environ.get("CHAT_WIRE_FORMAT", "binary")
+# Idade máxima (s) de uma notificação de webhook ou de um handshake assinado
+WEBHOOK_MAX_AGE = int(os.environ.get("CHAT_WEBHOOK_MAX_AGE", "300"))
+# "1" aceita notificações de nós antigos, assinadas sem timestamp/nonce (repetíveis)
+ACCEPT_LEGACY_WEBHOOKS = os.environ.get("CHAT_ACCEPT_LEGACY_WEBHOOKS", "0") == "1"
+# Controle de admissão do /receive ("0" desliga); ver admission.AdmissionControl.
+# Os limites valem por processo: com N workers (wsgi.py) o efetivo é N vezes maior.
+ADMISSION = os.environ.get("CHAT_ADMISSION", "1") != "0"
+MAX_BLOCKS = int(os.environ.get("CHAT_MAX_BLOCKS", "2048"))
+PEER_RATE = float(os.environ.get("CHAT_PEER_RATE", "50"))
+PEER_BURST = int(os.environ.get("CHAT_PEER_BURST", "100"))
+RECEIVE_QUEUE = int(os.environ.get("CHAT_RECEIVE_QUEUE", "32"))
+# Novas tentativas de um envio recusado com 429/503, e espera máxima (s) entre elas
+THROTTLE_RETRIES = int(os.environ.get("CHAT_THROTTLE_RETRIES", "3"))
+THROTTLE_MAX_WAIT = float(os.environ.get("CHAT_THROTTLE_MAX_WAIT", "5"))
+# Token do operador para POST /peers (Authorization: Bearer <token>); sem ele, só de loopback
+ADMIN_TOKEN = os.environ.get("CHAT_ADMIN_TOKEN")
+# Tamanho máximo do corpo de qualquer requisição (bytes); acima disso, 413
+MAX_BODY_BYTES = int(os.environ.get("CHAT_MAX_BODY_BYTES", str(8 * 1024 * 1024)))
+# Tamanho máximo de um anexo em /send_file e /receive_stream (bytes)
+MAX_STREAM_BYTES = int(os.environ.get("CHAT_MAX_STREAM_BYTES", str(1024 * 1024 * 1024)))
+# Folga para o texto cifrado e os quadros no limite do corpo de /receive_stream
+STREAM_BODY_LIMIT = MAX_STREAM_BYTES + MAX_STREAM_BYTES // 8 + streaming.MAX_FRAME
+
+
+def is_valid_url(url):
+    try:
+        result = urlparse(url)
+        return all([result.scheme, result.netloc])
+    except:
+        return False
+
+
+def webhook_message(signed_at, nonce):
+    """Texto assinado numa notificação de webhook: evento + timestamp + nonce."""
+    return f"new_message:{signed_at}:{nonce}"
+
+
+def handshake_message(nonce, signed_at, session_id, session_key, webhook_url):
+    """Texto assinado no handshake completo, resumido em SHA-256 para caber no módulo.
+
+    Cobre nonce, timestamp, a sessão (ID e SHA-256 da chave) e o webhook:
+    um handshake capturado não vale com outra chave de sessão nem outro webhook.
+    """
+    fields = [
+        str(nonce), str(signed_at), session_id or "",
+        hashlib.sha256(session_key).hexdigest() if session_key else "", webhook_url or "",
+    ]
+    return "handshake:" + hashlib.sha256("|".join(fields).encode()).hexdigest()
+
+
+def payload_blocks(payload):
+    """Custo de decifrar um corpo de /receive, em blocos RSA (sessão = 1)."""
+    text = payload.get("text") if isinstance(payload, dict) else None
+    return len(text) if isinstance(text, list) else 1
+
+
+def json_body(value):
+    """Bytes de um corpo JSON compacto, como os do jsonify."""
+    return (json.dumps(value, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def batch_chunk(payloads, start, max_messages):
+    """Pedaço de `payloads` a partir de `start` que cabe no /receive_batch do parceiro.
+
+    Os limites do parceiro não são anunciados: supõe-se que são os nossos
+    (MAX_BLOCKS blocos e MAX_BODY_BYTES de corpo, medido em JSON, que é
+    maior que o binário). Um corpo sozinho acima dos limites vai mesmo assim.
+    """
+    end = start
+    blocks = size = 0
+    while end < len(payloads) and end - start < max_messages:
+        blocks += payload_blocks(payloads[end])
+        size += len(json_body(payloads[end]))
+        if end > start and (blocks > MAX_BLOCKS or size > MAX_BODY_BYTES - 1024):
+            break
+        end += 1
+    return payloads[start:end]
+
+
+def retry_delay(response, attempt):
+    """Espera antes de repetir um envio recusado: o Retry-After do parceiro ou backoff."""
+    try:
+        delay = float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        delay = 0.25 * 2 ** attempt
+    return min(max(delay, 0), THROTTLE_MAX_WAIT)
+
+
+def with_backoff(send):
+    """Chama send() de novo enquanto o parceiro responder 429/503.
+
+    O controle de admissão recusa antes de decifrar, então repetir não
+    duplica mensagens.
+    """
+    for attempt in range(THROTTLE_RETRIES + 1):
+        response = send()
+        if response.status_code not in (429, 503) or attempt == THROTTLE_RETRIES:
+            return response
+        time.sleep(retry_delay(response, attempt))
+
+
+def _release_nothing():
+    pass
+
+
+def drain(stream, limit=MAX_BODY_BYTES):
+    """Lê e descarta até `limit` bytes do corpo que ficou sem ler.
+
+    Se respondermos no meio do envio, o cliente vê a conexão cair em vez da
+    resposta; corpos maiores que `limit` não valem o tráfego e caem mesmo.
+    """
+    with contextlib.suppress(Exception):
+        while limit > 0:
+            data = stream.read(min(limit, streaming.CHUNK_SIZE))
+            if not data:
+                break
+            limit -= len(data)
+
+
+class PeerError(Exception):
+    """Falha ao falar com um parceiro (handshake ou entrega)."""
+
+
+class UnknownSession(Exception):
+    """Mensagem em modo de sessão com um ID que não conhecemos."""
+
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+
+def batch_pool():
+    """Pool de processos para cifrar lotes em blocos; None se desabilitado."""
+    global _batch_pool
+    if BATCH_PROCESSES <= 0:
+        return None
+    if _batch_pool is None:
+        with _batch_pool_lock:
+            if _batch_pool is None:
+                _batch_pool = ProcessPoolExecutor(max_workers=BATCH_PROCESSES)
+    return _batch_pool
+
+
+class Node:
+    """Um nó do chat: chaves próprias, histórico e registro de parceiros.
+
+    Substitui as cópias quase idênticas de app1.py/app2.py; cada nó é
+    identificado por `node_id` e conversa com qualquer número de parceiros.
+    """
+
+    def __init__(self, node_id, name, port, peers=(), title=None,
+                 host="localhost", instance_path=None, key_bits=None, shared_state=False,
+                 admission=ADMISSION):
+        self.node_id = node_id
+        self.name = name
+        self.title = title or f"Chat de {name}"
+        self.base_url = f"http://{host}:{port}"
+        self.instance_path = instance_path
+        # Anexos: spool dos que estão chegando (e dos uploads) e os já recebidos
+        self.spool_path = os.path.join(instance_path, f"{node_id}_spool")
+        self.attachments_path = os.path.join(instance_path, f"{node_id}_attachments")
+        # Vários workers (wsgi.py): sessões, parceiros e nonces ficam num SQLite comum
+        self.state = SharedState(os.path.join(instance_path, f"{node_id}_state.db")) if shared_state else None
+        self.peers = PeerRegistry(peers, state=self.state)
+
+        # Chaves e histórico em instance/, lidos no primeiro uso
+        self.key_store = KeyStore(os.path.join(instance_path, f"{node_id}_keys.json"), bits=key_bits)
+        self.message_store = MessageStore(
+            os.path.join(instance_path, f"{node_id}_messages.db"),
+            capacity=int(os.environ.get("CHAT_RECENT_MESSAGES", "1000")),
+            shared=shared_state,
+        )
+        # Chaves públicas dos parceiros, em cache por URL (TTL + revalidação por ETag)
+        self.public_key_cache = PublicKeyCache(
+            ttl=int(os.environ.get("CHAT_KEY_CACHE_TTL", "300")),
+            timeout=float(os.environ.get("CHAT_KEY_FETCH_TIMEOUT", "3")),
+        )
+        # Sessões que os parceiros criaram para nos enviar mensagens, por ID
+        self.inbound_sessions = SessionTable(state=self.state)
+        self.decrypt_pool = DecryptPool(
+            workers=int(DECRYPT_PROCESSES) if DECRYPT_PROCESSES else None,
+            threshold=PARALLEL_DECRYPT_MIN_BLOCKS,
+        )
+        self.webhook_dispatcher = WebhookDispatcher(self.build_webhook_payload)
+        self._ticket_issuer = None
+        self.admission = AdmissionControl(
+            queue_size=RECEIVE_QUEUE, max_blocks=MAX_BLOCKS, peer_rate=PEER_RATE, peer_burst=PEER_BURST,
+        ) if admission else None
+        # Nonces já usados em notificações de webhook e handshakes
+        self.seen_nonces = NonceCache(ttl=2 * WEBHOOK_MAX_AGE, state=self.state)
+        self._fanout = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+        # Corpos de /messages e /public_key já serializados (e comprimidos)
+        self.response_cache = http_cache.ResponseCache()
+
+    # --- Parceiros ---
+    def fetch_public_key(self, url, refresh=False):
+        try:
+            return self.public_key_cache.get(url, refresh=refresh)
+        except Exception as e:
+            logger.error("Erro ao buscar chave pública: %s", e)
+            return None
+
+    def handshake_with(self, peer, register_webhook=False):
+        """Handshake com `peer`: retoma com o ticket, se houver, ou faz o completo."""
+        ticket = peer.ticket
+        if ticket is not None and ticket.valid:
+            try:
+                return self.resume_with(peer, ticket, register_webhook)
+            except PeerError as e:
+                logger.info("Retomada recusada (%s); fazendo handshake completo", e)
+                peer.ticket = None
+        self.full_handshake_with(peer, register_webhook)
+
+    def full_handshake_with(self, peer, register_webhook=False):
+        """Handshake completo com `peer`: nonce assinado + chave de sessão."""
+        # Chave pública do parceiro (cifra a chave de sessão)
+        partner_public_key = self.fetch_public_key(peer.key_url)
+        if not partner_public_key:
+            raise PeerError(f"Falha ao obter chave de {peer.name}")
+
+        nonce = os.urandom(16).hex()
+        signed_at = int(time.time())
+        session = SessionCipher.generate()
+        webhook_url = f"{self.base_url}/webhook_callback" if register_webhook else None
+        payload = {
+            "peer_id": self.node_id,
+            "name": self.name,
+            "nonce": nonce,
+            "signed_at": signed_at,
+            "signature": sign_message(
+                handshake_message(nonce, signed_at, session.session_id, session.key, webhook_url),
+                self.key_store.private_key,
+            ),
+            "partner_key_url": f"{self.base_url}/public_key",
+            "session": {
+                "id": session.session_id,
+                "key": encrypt_bytes(session.key, *partner_public_key)  # sem memo: chave aleatória
+            },
+            "wire": [wire_format.CONTENT_TYPE] if WIRE_FORMAT != "json" else [],
+        }
+        if webhook_url:
+            payload["webhook_url"] = webhook_url
+
+        response = http_client.post(peer.url("/handshake"), endpoint="handshake", json=payload)
+        if not response.ok:
+            raise PeerError(f"Handshake com {peer.name} falhou: {response.status_code}")
+
+        data = response.json()
+        # Parceiros antigos ignoram a sessão: seguimos no modo em blocos
+        self.finish_handshake(peer, partner_public_key, session if data.get("session") else None,
+                              payload["wire"], data)
+        if data.get("session") and data.get("ticket"):
+            peer.ticket = SessionTicket(
+                data["ticket"], session.key, partner_public_key,
+                time.time() + data.get("ticket_expires_in", 0),
+            )
+
+    def resume_with(self, peer, ticket, register_webhook=False):
+        """Retomada: ticket + prova com o segredo da sessão anterior (só HMACs)."""
+        webhook_url = f"{self.base_url}/webhook_callback" if register_webhook else None
+        session, fields = ticket.resume_request(webhook_url)
+        payload = {
+            "peer_id": self.node_id,
+            "name": self.name,
+            "resume": fields,
+            "wire": [wire_format.CONTENT_TYPE] if WIRE_FORMAT != "json" else [],
+        }
+        if webhook_url:
+            payload["webhook_url"] = webhook_url
+
+        response = http_client.post(peer.url("/handshake"), endpoint="handshake", json=payload)
+        # Parceiros sem retomada tratam o pedido como handshake incompleto (400/500)
+        if not response.ok or not response.json().get("resumed"):
+            raise PeerError(f"Retomada com {peer.name} falhou: {response.status_code}")
+        session.peer_id = peer.peer_id
+        self.finish_handshake(peer, ticket.partner_key, session, payload["wire"], response.json())
+
+    def finish_handshake(self, peer, partner_public_key, session, offered_wire, data):
+        peer.bind_key(partner_public_key)
+        peer.outbound_session = session
+        # Formato binário só se os dois lados quiserem; parceiros antigos não respondem "wire"
+        accepted = data.get("wire") or []
+        peer.wire_format = next((fmt for fmt in offered_wire if fmt in accepted), None)
+
+    @property
+    def ticket_issuer(self):
+        """Emissor de tickets com chave derivada da chave privada.
+
+        Vale para todos os workers e sobrevive a reinícios; trocar o par de
+        chaves invalida os tickets emitidos.
+        """
+        if self._ticket_issuer is None:
+            secret = str(self.key_store.private_key.d).encode()
+            self._ticket_issuer = TicketIssuer(hmac.digest(secret, b"chat-ticket", "sha256"))
+        return self._ticket_issuer
+
+    def verified_key(self, peer):
+        """Chave pública confirmada de `peer` (None se não houver handshake).
+
+        Com vários workers o handshake pode ter sido feito por outro
+        processo; aí a chave vem do cache de /public_key do parceiro.
+        """
+        if peer is None:
+            return None
+        if peer.public_key is None and self.state is not None:
+            return self.fetch_public_key(peer.key_url)
+        return peer.public_key
+
+    def ensure_handshake(self, peer):
+        with peer.lock:
+            if peer.public_key is None:
+                self.handshake_with(peer)
+
+    def encrypt_for(self, peer, texts, session):
+        """Corpos de /receive para `texts`, com a sessão ou em blocos.
+
+        Lotes grandes em blocos vão para o pool de processos (se habilitado):
+        cada bloco é uma exponenciação RSA e segura o GIL.
+        """
+        if session is not None:
+            payloads = [session.encrypt(text) for text in texts]
+        else:
+            encryptor = peer.encryptor
+            pool = batch_pool() if len(texts) >= BATCH_POOL_MIN else None
+            if pool is not None:
+                encrypted = pool.map(encrypt_blocks, texts, repeat(encryptor.e), repeat(encryptor.n))
+            else:
+                encrypted = (encryptor.encrypt_blocks(text) for text in texts)
+            payloads = [{"mode": BLOCK_MODE, "text": blocks} for blocks in encrypted]
+        for payload in payloads:
+            payload["peer_id"] = self.node_id
+        return payloads
+
+    def post_to(self, peer, path, body):
+        """POST de um corpo de /receive(_batch) no formato negociado com `peer`.
+
+        Se o parceiro recusar o binário (415), volta ao JSON de vez; 429/503
+        são repetidos respeitando o Retry-After (with_backoff).
+        """
+        if peer.wire_format:
+            data = wire_format.dumps(body)
+            response = with_backoff(lambda: http_client.post(
+                peer.url(path), endpoint="receive", data=data, headers={"Content-Type": peer.wire_format},
+            ))
+            if response.status_code != 415:
+                return response
+            peer.wire_format = None
+        return with_backoff(lambda: http_client.post(peer.url(path), endpoint="receive", json=body))
+
+    def deliver(self, peer, text):
+        """Cifra `text` para `peer` e envia para o /receive dele."""
+        self.ensure_handshake(peer)
+        session = peer.outbound_session
+        payload, = self.encrypt_for(peer, [text], session)
+        response = self.post_to(peer, "/receive", payload)
+
+        if response.status_code == 409 and session is not None:
+            # O parceiro perdeu a sessão (reinício): reenvia em blocos e refaz o handshake no próximo envio
+            payload, = self.encrypt_for(peer, [text], None)
+            self.reset_peer(peer)
+            response = self.post_to(peer, "/receive", payload)
+        response.raise_for_status()
+
+    def deliver_batch(self, peer, texts):
+        """Envia `texts` para `peer` em POSTs para /receive_batch (ver post_batches).
+
+        Se a sessão foi perdida (409), o que faltou vai em blocos, como em deliver().
+        """
+        self.ensure_handshake(peer)
+        session = peer.outbound_session
+        payloads = self.encrypt_for(peer, texts, session)
+        sent = self.post_batches(peer, payloads)
+
+        if sent < len(payloads) and session is not None:
+            payloads = self.encrypt_for(peer, texts[sent:], None)
+            self.reset_peer(peer)
+            sent = self.post_batches(peer, payloads)
+        if sent < len(payloads):
+            raise PeerError(f"{peer.name} recusou o lote: sessão desconhecida")
+
+    def post_batches(self, peer, payloads):
+        """POSTs de /receive_batch com `payloads` em pedaços (batch_chunk); retorna quantos foram.
+
+        Um pedaço recusado com 413 é dividido ao meio e reenviado. O
+        parceiro grava cada pedaço atomicamente, não o lote inteiro. Para no
+        primeiro 409 (sessão perdida); parceiros sem /receive_batch (404)
+        recebem uma mensagem por vez.
+        """
+        sent, max_messages = 0, len(payloads)
+        while sent < len(payloads):
+            chunk = batch_chunk(payloads, sent, max_messages)
+            response = self.post_to(peer, "/receive_batch", {"peer_id": self.node_id, "messages": chunk})
+            if response.status_code == 413 and len(chunk) > 1:
+                max_messages = len(chunk) // 2
+                continue
+            if response.status_code == 409:
+                return sent
+            if response.status_code == 404:
+                for payload in payloads[sent:]:
+                    self.post_to(peer, "/receive", payload).raise_for_status()
+                return len(payloads)
+            response.raise_for_status()
+            sent += len(chunk)
+        return sent
+
+    def deliver_file(self, peer, path, filename, content_type=None):
+        """Envia o arquivo `path` para o /receive_stream de `peer`, em pedaços.
+
+        Se a sessão foi perdida (409), reenvia em blocos, como deliver().
+        """
+        self.ensure_handshake(peer)
+        session, public_key = peer.outbound_session, peer.public_key
+        header = {"peer_id": self.node_id, "filename": filename, "content_type": content_type}
+        response = self.post_stream(peer, path, header, session, public_key)
+
+        if response.status_code == 409 and session is not None:
+            self.reset_peer(peer)
+            response = self.post_stream(peer, path, header, None, public_key)
+        response.raise_for_status()
+
+    def post_stream(self, peer, path, header, session, public_key):
+        """POST chunked: o corpo é o gerador de streaming.encode lendo o arquivo."""
+        def send():
+            # Cada tentativa relê o arquivo: o gerador só pode ser enviado uma vez
+            with open(path, "rb") as f:
+                body = streaming.encode(header, streaming.iter_file(f), session, public_key)
+                return http_client.post(
+                    peer.url("/receive_stream"), endpoint="stream",
+                    data=body, headers={"Content-Type": streaming.CONTENT_TYPE},
+                )
+
+        return with_backoff(send)
+
+    def reset_peer(self, peer):
+        """Descarta chave e sessão: o próximo envio refaz o handshake.
+
+        O ticket fica: o parceiro reiniciado continua aceitando a retomada.
+        Se ela falhar, o handshake completo busca a chave de novo (o parceiro
+        pode ter trocado de chave ao reiniciar).
+        """
+        peer.outbound_session = None
+        peer.wire_format = None
+        peer.bind_key(None)
+        self.public_key_cache.invalidate(peer.key_url)
+
+    def fan_out(self, peers, func, *args):
+        """Executa func(peer, *args) para todos os parceiros em paralelo.
+
+        Retorna (IDs que deram certo, {ID: erro} dos que falharam).
+        """
+        futures = {peer.peer_id: self._fanout.submit(func, peer, *args) for peer in peers}
+        delivered, failed = [], {}
+        for peer_id, future in futures.items():
+            try:
+                future.result()
+                delivered.append(peer_id)
+            except Exception as e:
+                logger.error("Erro ao falar com %s: %s", peer_id, e)
+                failed[peer_id] = str(e)
+        return delivered, failed
+
+    def selected_peers(self, peer_ids):
+        """Parceiros pedidos (todos se `peer_ids` for vazio); None se algum for desconhecido.
+
+        "Todos" são só os da configuração e os incluídos pelo operador em
+        POST /peers: o /handshake não registra parceiros novos.
+        """
+        if not peer_ids:
+            return self.peers.all()
+        peers = [self.peers.get(peer_id) for peer_id in peer_ids]
+        return None if None in peers else peers
+
+    def build_webhook_payload(self, events):
+        """Um POST por lote: a assinatura é calculada uma vez para todo o lote.
+
+        A assinatura cobre timestamp e nonce: o destinatário rejeita
+        notificações velhas e ignora repetições (inclusive as do próprio
+        dispatcher, que reenvia o mesmo corpo).
+        """
+        signed_at = int(time.time())
+        nonce = os.urandom(8).hex()
+        return {
+            "event": "new_message",
+            "peer_id": self.node_id,
+            "sender": self.name,
+            "count": len(events),
+            "signed_at": signed_at,
+            "nonce": nonce,
+            "signature": sign_message(webhook_message(signed_at, nonce), self.key_store.private_key),
+            "timestamp": events[-1]["timestamp"]
+        }
+
+    # --- Rotas ---
+    def index(self):
+        return render_template(
+            "chat.html", title=self.title, messages=self.message_store.page(limit=MAX_PAGE)
+        )
+
+    def cached_json(self, key, version, build, last_modified=None, max_age=None):
+        """Resposta JSON de build(), serializada uma vez por `version` (ver http_cache)."""
+        def serialize():
+            body = json_body(build())
+            # ETag pelo conteúdo: igual entre workers e reinícios
+            return body, hashlib.sha256(body).hexdigest()[:16], last_modified
+
+        return http_cache.cached_response(self.response_cache.get(key, version, serialize), max_age=max_age)
+
+    def public_key(self):
+        e, n = self.key_store.public_key
+        # Versão = a própria chave: trocar o par de chaves invalida o corpo
+        entry = self.response_cache.get(("public_key",), (e, n), lambda: (
+            json_body({"e": e, "n": n}),
+            # ETag = impressão digital da chave: parceiros revalidam com If-None-Match
+            key_fingerprint((e, n)),
+            None,
+        ))
+        return http_cache.cached_response(entry, max_age=self.public_key_cache.ttl)
+
+    def is_operator(self):
+        """True se a requisição vem do operador do nó.
+
+        Com CHAT_ADMIN_TOKEN, vale o token no cabeçalho Authorization; sem
+        ele, só requisições de loopback (a própria máquina).
+        """
+        if ADMIN_TOKEN:
+            supplied = request.headers.get("Authorization", "").encode()
+            return hmac.compare_digest(supplied, f"Bearer {ADMIN_TOKEN}".encode())
+        try:
+            return ipaddress.ip_address(request.remote_addr or "").is_loopback
+        except ValueError:
+            return False
+
+    def list_peers(self):
+        if request.method == "POST":
+            # Parceiros registrados recebem o /send sem destinatário: só o operador inclui novos
+            if not self.is_operator():
+                return jsonify({"error": "Só o operador do nó registra parceiros"}), 403
+            data = request.json or {}
+            if not data.get("peer_id") or not is_valid_url(data.get("base_url", "")):
+                return jsonify({"error": "peer_id e base_url são obrigatórios"}), 400
+            # Trocar o endereço de um parceiro desviaria as mensagens dele
+            if self.peers.get(data["peer_id"]) is not None:
+                return jsonify({"error": "Parceiro já registrado"}), 409
+            self.peers.add(Peer(data["peer_id"], data["base_url"], name=data.get("name")))
+        return jsonify([peer.to_dict() for peer in self.peers.all()])
+
+    def register_webhook(self):
+        data = request.json
+        webhook_url = data.get("webhook_url")  # Ex: "http://localhost:5001/webhook_callback"
+
+        if not webhook_url:
+            return jsonify({"error": "URL do webhook inválida"}), 400
+
+        if not is_valid_url(webhook_url):
+            return jsonify({"error": "URL inválida"}), 400
+
+        peer = self.peers.resolve(peer_id=data.get("peer_id"), url=webhook_url)
+        if peer is None:
+            return jsonify({"error": "Parceiro desconhecido"}), 404
+        if not peer.serves(webhook_url):
+            return jsonify({"error": "Webhook fora do endereço do parceiro"}), 403
+        peer.webhook_url = webhook_url
+        self.peers.save(peer)
+
+        return jsonify({"status": "Webhook registrado com sucesso!"})
+
+    def webhook_callback(self):
+        data = request.get_json(silent=True)
+        # Uma notificação ou uma lista delas (rajada repassada de uma vez)
+        notifications = data if isinstance(data, list) else [data]
+        if not notifications or not all(
+            isinstance(item, dict) and isinstance(item.get("signature"), int) for item in notifications
+        ):
+            return jsonify({"error": "Assinatura ausente"}), 400
+
+        # Verifica as assinaturas com a chave pública de quem notificou. Cada notificação
+        # assina timestamp e nonce próprios (sem cache: nenhuma assinatura se repete); o
+        # custo cai do lado do remetente, que assina um lote do dispatcher de uma vez.
+        fresh = []
+        for item in notifications:
+            peer = self.peers.resolve(peer_id=item.get("peer_id"), name=item.get("sender"))
+            public_key = self.verified_key(peer)
+            if public_key is None:
+                return jsonify({"error": "Assinatura inválida"}), 401
+            if "nonce" in item:
+                signed_at = item.get("signed_at")
+                if not isinstance(signed_at, int) or abs(time.time() - signed_at) > WEBHOOK_MAX_AGE:
+                    return jsonify({"error": "Notificação expirada"}), 401
+                nonce = f"{peer.peer_id}:{item['nonce']}"
+                if nonce in self.seen_nonces:
+                    continue  # Já processada: reenvio do dispatcher ou replay
+                message = webhook_message(signed_at, item["nonce"])
+            elif not ACCEPT_LEGACY_WEBHOOKS:
+                return jsonify({"error": "Notificação sem nonce"}), 401
+            else:
+                # Remetentes antigos: assinatura constante, repetível
+                nonce, message = None, "new_message"
+            if not verify_signature(item["signature"], message, public_key):
+                return jsonify({"error": "Assinatura inválida"}), 401
+            fresh.append((peer, item, nonce))
+
+        duplicates = len(notifications) - len(fresh)
+        for peer, item, nonce in fresh:
+            if nonce is not None and not self.seen_nonces.add(nonce):
+                duplicates += 1
+                continue
+            logger.info(
+                "Notificação de webhook de %s autenticada! (%s mensagem(ns))",
+                peer.name, item.get("count", 1)
+            )
+        return jsonify({"status": "ok", "duplicates": duplicates})
+
+    def handshake(self):
+        data = request.json
+        if "resume" in data:
+            return self.resume_handshake(data)
+        nonce = data["nonce"]
+        signature = data["signature"]
+        partner_key_url = data["partner_key_url"]
+        webhook_url = data.get("webhook_url")
+        if webhook_url is not None and not is_valid_url(webhook_url):
+            return jsonify({"error": "URL do webhook inválida"}), 400
+
+        # Nonce de uso único dentro da janela do timestamp: handshakes capturados não se repetem
+        signed_at = data.get("signed_at")
+        if not isinstance(signed_at, int) or abs(time.time() - signed_at) > WEBHOOK_MAX_AGE:
+            return jsonify({"error": "Handshake expirado"}), 401
+        nonce_key = f"handshake:{nonce}"
+        if nonce_key in self.seen_nonces:
+            logger.warning("Handshake repetido (nonce %s) de %s", nonce, partner_key_url)
+            return jsonify({"error": "Handshake repetido"}), 401
+
+        # Só parceiros registrados (configuração ou POST /peers), com a chave servida pelo endereço deles
+        peer = self.peers.resolve(peer_id=data.get("peer_id"), url=partner_key_url)
+        if peer is None:
+            logger.warning("Handshake de parceiro não registrado: %s", partner_key_url)
+            return jsonify({"error": "Parceiro desconhecido"}), 403
+        if not peer.serves(partner_key_url):
+            logger.warning("Handshake como %s com chave de outro endereço: %s", peer.peer_id, partner_key_url)
+            return jsonify({"error": "Autenticação falhou!"}), 401
+
+        partner_public_key = self.fetch_public_key(partner_key_url)
+        if partner_public_key is None:
+            return jsonify({"error": "Chave pública do parceiro indisponível"}), 502
+
+        # Chave de sessão cifrada com a nossa chave pública (modo híbrido); a assinatura cobre o hash dela
+        session_id = session_key = None
+        if "session" in data:
+            try:
+                session_id = str(data["session"]["id"])
+                session_key = decrypt_bytes(data["session"]["key"], self.key_store.private_key)
+            except Exception as e:
+                logger.warning("Chave de sessão inválida no handshake: %s", e)
+                return jsonify({"error": "Chave de sessão inválida"}), 400
+
+        message = handshake_message(nonce, signed_at, session_id, session_key, webhook_url)
+        if not verify_signature(signature, message, partner_public_key):
+            # A chave em cache pode estar desatualizada (parceiro trocou de chave)
+            partner_public_key = self.fetch_public_key(partner_key_url, refresh=True)
+            if partner_public_key is None or not verify_signature(signature, message, partner_public_key):
+                return jsonify({"error": "Autenticação falhou!"}), 401
+        if not self.seen_nonces.add(nonce_key):
+            return jsonify({"error": "Handshake repetido"}), 401
+
+        peer.bind_key(partner_public_key)
+
+        response = {"status": "Autenticado com sucesso!", "session": False, "wire": [wire_format.CONTENT_TYPE]}
+        if session_key is not None:
+            self.inbound_sessions.put(SessionCipher(session_key, session_id, peer.peer_id))
+            response["session"] = True
+            # Próximos handshakes deste parceiro podem ser retomados com o ticket
+            response["ticket"] = self.ticket_issuer.issue(
+                peer.peer_id, partner_key_url, partner_public_key, session_key
+            )
+            response["ticket_expires_in"] = self.ticket_issuer.ttl
+
+        self.register_peer_webhook(peer, data)
+        return jsonify(response)
+
+    def resume_handshake(self, data):
+        """Handshake retomado: confere ticket e prova, sem buscar chave nem RSA."""
+        try:
+            ticket, session = self.ticket_issuer.resume(data["resume"], data.get("webhook_url"))
+        except ValueError as e:
+            logger.info("Retomada de handshake recusada: %s", e)
+            return jsonify({"error": "Ticket inválido", "resumed": False}), 401
+
+        peer = self.peers.resolve(peer_id=ticket["peer_id"], url=ticket["key_url"])
+        if peer is None or not peer.serves(ticket["key_url"]):
+            return jsonify({"error": "Ticket inválido", "resumed": False}), 401
+        peer.bind_key(ticket["partner_key"])
+        session.peer_id = peer.peer_id
+        self.inbound_sessions.put(session)
+        self.register_peer_webhook(peer, data)
+        return jsonify({
+            "status": "Sessão retomada!",
+            "session": True,
+            "resumed": True,
+            "wire": [wire_format.CONTENT_TYPE],
+        })
+
+    def register_peer_webhook(self, peer, data):
+        if "webhook_url" in data:  # Se o parceiro enviou sua URL de webhook
+            peer.webhook_url = data["webhook_url"]
+            self.peers.save(peer)
+            logger.info("Webhook de %s registrado: %s", peer.peer_id, peer.webhook_url)
+
+    def init_handshake(self):
+        """Handshake (com registro de webhook) com os parceiros pedidos ou com todos."""
+        data = request.get_json(silent=True) or {}
+        peers = self.selected_peers(data.get("peers") or request.args.getlist("peer"))
+        if peers is None:
+            return jsonify({"error": "Parceiro desconhecido"}), 404
+        done, failed = self.fan_out(peers, self.handshake_with, True)
+        if failed and not done:
+            return jsonify({"error": "Handshake falhou", "failed": failed}), 500
+        return jsonify({"status": "Handshake iniciado!", "peers": done, "failed": failed})
+
+    def send(self):
+        text = request.form.get("text", "").strip()
+        if not text:
+            return jsonify({"error": "Mensagem vazia"}), 400
+
+        # ?peer=<id> (repetível) escolhe os destinatários; sem ele vai para todos os registrados
+        peers = self.selected_peers(request.form.getlist("peer") or request.args.getlist("peer"))
+        if peers is None:
+            return jsonify({"error": "Parceiro desconhecido"}), 404
+        if not peers:
+            return jsonify({"error": "Nenhum parceiro registrado"}), 400
+
+        delivered, failed = self.fan_out(peers, self.deliver, text)
+        if not delivered:
+            return jsonify({"error": "Falha ao enviar mensagem", "failed": failed}), 500
+        return jsonify({"status": "ok", "delivered": delivered, "failed": failed})
+
+    def send_batch(self):
+        """JSON {"texts": [...], "peers": [...]}: um POST por parceiro com todo o lote."""
+        data = request.get_json(silent=True) or {}
+        texts = [text.strip() for text in data.get("texts", []) if isinstance(text, str) and text.strip()]
+        if not texts:
+            return jsonify({"error": "Lote vazio"}), 400
+
+        peers = self.selected_peers(data.get("peers"))
+        if peers is None:
+            return jsonify({"error": "Parceiro desconhecido"}), 404
+        if not peers:
+            return jsonify({"error": "Nenhum parceiro registrado"}), 400
+
+        delivered, failed = self.fan_out(peers, self.deliver_batch, texts)
+        if not delivered:
+            return jsonify({"error": "Falha ao enviar lote", "failed": failed}), 500
+        return jsonify({"status": "ok", "count": len(texts), "delivered": delivered, "failed": failed})
+
+    def send_file(self):
+        """Upload multipart (campo "file") repassado em streaming aos parceiros.
+
+        O upload vai para o spool em disco e cada parceiro recebe sua cópia
+        lida de lá, pedaço a pedaço.
+        """
+        request.max_content_length = MAX_STREAM_BYTES
+        upload = request.files.get("file")
+        filename = secure_filename(upload.filename or "") if upload else ""
+        if not filename:
+            return jsonify({"error": "Arquivo ausente"}), 400
+
+        peers = self.selected_peers(request.form.getlist("peer") or request.args.getlist("peer"))
+        if peers is None:
+            return jsonify({"error": "Parceiro desconhecido"}), 404
+        if not peers:
+            return jsonify({"error": "Nenhum parceiro registrado"}), 400
+
+        os.makedirs(self.spool_path, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=".upload", dir=self.spool_path)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(upload.stream, f, streaming.CHUNK_SIZE)
+            delivered, failed = self.fan_out(peers, self.deliver_file, path, filename, upload.mimetype)
+        finally:
+            os.remove(path)
+        if not delivered:
+            return jsonify({"error": "Falha ao enviar arquivo", "failed": failed}), 500
+        return jsonify({"status": "ok", "delivered": delivered, "failed": failed})
+
+    def decrypt_payload(self, data, pow_many=None):
+        """Decifra um corpo de /receive; retorna (texto, sessão ou None).
+
+        Levanta UnknownSession se a sessão não existir (o remetente deve
+        refazer o handshake) e ValueError/KeyError se o corpo for inválido.
+        `pow_many` substitui as exponenciações RSA (padrão: decrypt_pool).
+        """
+        pow_many = pow_many or self.decrypt_pool.pow_many
+        encrypted_msg = data["text"]
+        mode = data.get("mode")  # Ausente = formato legado (um número por caractere)
+        logger.debug("[%s] Mensagem criptografada recebida: %s", self.node_id, encrypted_msg)
+
+        # Com a nossa chave PRIVADA ou com a sessão criada pelo remetente
+        if mode == SESSION_MODE:
+            session = self.inbound_sessions.get(data.get("session_id"))
+            if session is None:
+                raise UnknownSession(data.get("session_id"))
+            decrypted_msg = session.decrypt(data)
+        elif mode == BLOCK_MODE:
+            session = None
+            decrypted_msg = decrypt_blocks(encrypted_msg, self.key_store.private_key, pow_many)
+        else:
+            session = None
+            decrypted_msg = decrypt_rsa(encrypted_msg, self.key_store.private_key, pow_many)
+        logger.debug("[%s] Mensagem descriptografada: %s", self.node_id, decrypted_msg)
+        return decrypted_msg, session
+
+    def sender_of(self, data, session):
+        peer = self.peers.resolve(peer_id=session.peer_id if session else data.get("peer_id"))
+        return peer, (peer.name if peer else data.get("peer_id", "Desconhecido"))
+
+    def read_body(self):
+        """Corpo de /receive(_batch): JSON ou o formato binário; None se inválido."""
+        if request.mimetype == wire_format.CONTENT_TYPE:
+            try:
+                return wire_format.loads(request.get_data())
+            except ValueError as e:
+                logger.warning("Corpo binário inválido: %s", e)
+                return None
+        return request.json
+
+    def admission_key(self, payloads=()):
+        """Quem paga a taxa: o parceiro da sessão ou, sem ela, o endereço de origem.
+
+        O peer_id do corpo não serve: qualquer um escreve o que quiser ali e
+        ganharia um balde novo a cada ID inventado. O session_id também vai
+        em claro, então a sessão só conta se o MAC do corpo conferir (um
+        HMAC, antes de qualquer RSA). Num lote, todos os corpos precisam ser
+        de sessões do mesmo parceiro e conferir.
+        """
+        peer_ids = set()
+        for data in payloads:
+            if not isinstance(data, dict) or data.get("mode") != SESSION_MODE:
+                return f"addr:{request.remote_addr}"
+            session_id = data.get("session_id")
+            session = self.inbound_sessions.get(session_id) if isinstance(session_id, str) else None
+            if session is None or not session.peer_id or not session.verify(data):
+                return f"addr:{request.remote_addr}"
+            peer_ids.add(session.peer_id)
+        if len(peer_ids) == 1:
+            return f"peer:{peer_ids.pop()}"
+        return f"addr:{request.remote_addr}"
+
+    def admit(self, payloads, blocks, messages=1):
+        """Passa pelo controle de admissão; retorna a função que libera a vaga."""
+        if self.admission is None:
+            return _release_nothing
+        return self.admission.admit(self.admission_key(payloads), blocks, messages)
+
+    def rejection(self, error):
+        """Resposta rápida para uma requisição recusada (413/429/503)."""
+        response = jsonify({"error": error.reason})
+        response.status_code = error.status
+        if error.retry_after is not None:
+            response.headers["Retry-After"] = str(max(1, math.ceil(error.retry_after)))
+        return response
+
+    def receive(self):
+        # 1. Validação básica da requisição
+        data = self.read_body()
+        if not isinstance(data, dict) or "text" not in data:
+            logger.warning("Dados inválidos recebidos")
+            return jsonify({"error": "Dados inválidos"}), 400
+
+        # 2. Admissão: tamanho, taxa do parceiro e vaga na fila
+        try:
+            release = self.admit([data], payload_blocks(data))
+        except Rejected as e:
+            logger.warning("[%s] /receive recusado (%s): %s", self.node_id, e.status, e.reason)
+            return self.rejection(e)
+
+        try:
+            # 3. Descriptografa a mensagem
+            try:
+                decrypted_msg, session = self.decrypt_payload(data)
+            except UnknownSession:
+                # Remetente deve refazer o handshake
+                return jsonify({"error": "Sessão desconhecida"}), 409
+            except Exception as e:
+                logger.error("[%s] ERRO ao descriptografar: %s", self.node_id, e)
+                return jsonify({"error": "Mensagem inválida"}), 400
+
+            # 4. Armazena a mensagem identificando o remetente
+            peer, sender = self.sender_of(data, session)
+            self.message_store.append(sender, decrypted_msg)
+        finally:
+            release()
+
+        # 5. Notifica o remetente via webhook (se registrado), em segundo plano
+        if peer is not None and peer.webhook_url:
+            self.webhook_dispatcher.notify(peer.webhook_url, {"timestamp": datetime.now().isoformat()})
+
+        return jsonify({
+            "status": "ok",
+            "message": "Mensagem recebida"
+        })
+
+    def batch_pow_many(self, payloads):
+        """Exponenciações de todos os corpos RSA do lote numa só passada pelo pool.
+
+        Retorna um pow_many que entrega os resultados na ordem em que
+        decrypt_payload os pede; None se o lote tiver algum corpo malformado
+        (aí cada corpo é decifrado e validado isoladamente).
+        """
+        try:
+            values = [
+                value
+                for payload in payloads if payload.get("mode") != SESSION_MODE
+                for value in payload["text"]
+            ]
+        except (AttributeError, KeyError, TypeError):
+            return None
+        if any(not isinstance(value, int) for value in values):
+            return None
+        results = iter(self.decrypt_pool.pow_many(values, self.key_store.private_key))
+        return lambda encrypted, private_key: [next(results) for _ in encrypted]
+
+    def receive_batch(self):
+        """Lote de corpos de /receive: ou todos são gravados, ou nenhum."""
+        data = self.read_body()
+        if not isinstance(data, dict) or not isinstance(data.get("messages"), list):
+            return jsonify({"error": "Dados inválidos"}), 400
+
+        # O lote inteiro conta: blocos somados e uma ficha por mensagem
+        try:
+            release = self.admit(
+                data["messages"],
+                sum(payload_blocks(payload) for payload in data["messages"]), len(data["messages"]),
+            )
+        except Rejected as e:
+            logger.warning("[%s] /receive_batch recusado (%s): %s", self.node_id, e.status, e.reason)
+            return self.rejection(e)
+
+        try:
+            pow_many = self.batch_pow_many(data["messages"])
+            items = []
+            peer = None
+            for index, payload in enumerate(data["messages"]):
+                if not isinstance(payload, dict):
+                    return jsonify({"error": "Mensagem inválida", "index": index}), 400
+                payload.setdefault("peer_id", data.get("peer_id"))
+                try:
+                    decrypted_msg, session = self.decrypt_payload(payload, pow_many)
+                except UnknownSession:
+                    return jsonify({"error": "Sessão desconhecida", "index": index}), 409
+                except Exception as e:
+                    logger.error("[%s] ERRO ao descriptografar lote: %s", self.node_id, e)
+                    return jsonify({"error": "Mensagem inválida", "index": index}), 400
+                peer, sender = self.sender_of(payload, session)
+                items.append((sender, decrypted_msg))
+
+            self.message_store.extend(items)
+        finally:
+            release()
+
+        if items and peer is not None and peer.webhook_url:
+            self.webhook_dispatcher.notify(peer.webhook_url, {"timestamp": datetime.now().isoformat()})
+
+        return jsonify({"status": "ok", "received": len(items)})
+
+    def receive_stream(self):
+        """Anexo em streaming (streaming.py): decifra pedaço a pedaço num arquivo de spool.
+
+        Só um pedaço fica na memória; o arquivo vai para os anexos quando o
+        fecho confere, e o histórico ganha uma mensagem apontando para ele.
+        """
+        if request.mimetype != streaming.CONTENT_TYPE:
+            return jsonify({"error": "Formato não suportado"}), 415
+        request.max_content_length = STREAM_BODY_LIMIT
+        stream = request.stream
+        try:
+            reader = streaming.StreamReader(stream)
+        except (ValueError, RequestEntityTooLarge) as e:
+            logger.warning("Stream inválido: %s", e)
+            drain(stream)
+            return jsonify({"error": "Dados inválidos"}), 400
+
+        session = None
+        if reader.mode == SESSION_MODE:
+            session = self.inbound_sessions.get(reader.header.get("session_id"))
+            if session is None:
+                drain(stream)
+                return jsonify({"error": "Sessão desconhecida"}), 409
+
+        try:
+            if self.admission is None:
+                release = _release_nothing
+            else:
+                # O cabeçalho do stream não tem MAC: quem paga é o endereço de origem
+                release = self.admission.admit_stream(self.admission_key())
+        except Rejected as e:
+            logger.warning("[%s] /receive_stream recusado (%s): %s", self.node_id, e.status, e.reason)
+            drain(stream)
+            return self.rejection(e)
+
+        filename = secure_filename(str(reader.header.get("filename") or "")) or "anexo"
+        os.makedirs(self.spool_path, exist_ok=True)
+        spool = tempfile.NamedTemporaryFile(suffix=".part", dir=self.spool_path, delete=False)
+        try:
+            with spool:
+                trailer = reader.copy_to(
+                    spool, session, self.key_store.private_key,
+                    self.decrypt_pool.pow_many, MAX_STREAM_BYTES,
+                )
+            os.makedirs(self.attachments_path, exist_ok=True)
+            stored_name = f"{uuid.uuid4().hex[:12]}-{filename}"
+            os.replace(spool.name, os.path.join(self.attachments_path, stored_name))
+        except (streaming.StreamTooLarge, RequestEntityTooLarge) as e:
+            logger.warning("[%s] Anexo recusado: %s", self.node_id, e)
+            return jsonify({"error": "Anexo grande demais"}), 413
+        except Exception as e:
+            logger.error("[%s] ERRO ao descriptografar anexo: %s", self.node_id, e)
+            drain(stream)
+            return jsonify({"error": "Anexo inválido"}), 400
+        finally:
+            release()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(spool.name)
+
+        peer, sender = self.sender_of(reader.header, session)
+        self.message_store.append(
+            sender, f"[arquivo] {filename} ({trailer['size']} bytes): /attachments/{stored_name}"
+        )
+        if peer is not None and peer.webhook_url:
+            self.webhook_dispatcher.notify(peer.webhook_url, {"timestamp": datetime.now().isoformat()})
+
+        return jsonify({"status": "ok", "size": trailer["size"], "attachment": f"/attachments/{stored_name}"})
+
+    def attachment(self, name):
+        return send_from_directory(self.attachments_path, name, as_attachment=True)
+
+    def stats(self):
+        return jsonify({
+            "webhook": self.webhook_dispatcher.stats(),
+            "admission": self.admission.stats() if self.admission else None,
+            "response_cache": self.response_cache.stats(),
+            "spans": metrics.snapshot(),
+            "peers": len(self.peers),
+        })
+
+    def prometheus_metrics(self):
+        return Response(metrics.prometheus(), mimetype="text/plain; version=0.0.4")
+
+    def get_messages(self):
+        """Histórico em JSON; o corpo só é refeito quando chega mensagem nova.
+
+        A resposta de uma mesma URL depende só da última mensagem (o
+        histórico só cresce): ETag e Last-Modified vêm dela, e o polling
+        que repete If-None-Match recebe 304.
+        """
+        store = self.message_store
+        # limit fora de 1..MAX_PAGE é ajustado (negativo quebraria o fatiamento do ring buffer)
+        limit = max(1, min(request.args.get("limit", default=MAX_PAGE, type=int), MAX_PAGE))
+        # ?before=<id> pagina o histórico para trás (mensagens mais antigas)
+        before = request.args.get("before", type=int)
+        # ?since=<id> devolve só as mensagens posteriores a esse ID
+        since = request.args.get("since", type=int)
+        if before is not None:
+            key = ("messages", "before", before, limit)
+            build = lambda: [msg.to_dict() for msg in store.page(before, limit)]
+        elif since is None:
+            # Sem cursor: a página mais recente (o histórico persiste e passa de MAX_PAGE)
+            key = ("messages", "latest", limit)
+            build = lambda: [msg.to_dict() for msg in store.page(None, limit)]
+        else:
+            since = max(since, 0)
+            # ?wait=<s> (long-poll): segura a resposta até chegar algo novo
+            wait = min(request.args.get("wait", default=0, type=float), STREAM_KEEPALIVE)
+            if wait > 0:
+                store.wait(since, wait)
+            key = ("messages", "since", since, limit)
+            build = lambda: [msg.to_dict() for msg in store.since(since, limit)]
+        last_id, last_modified = store.latest
+        return self.cached_json(key, last_id, build, last_modified)
+
+    def stream(self):
+        """Server-Sent Events: uma mensagem por evento, com o ID como cursor."""
+        store = self.message_store
+        since = request.headers.get("Last-Event-ID", type=int)
+        if since is None:
+            since = request.args.get("since", default=0, type=int)
+
+        def events(since):
+            yield "retry: 2000\n\n"
+            while True:
+                store.wait(since, STREAM_KEEPALIVE)
+                new_messages = store.since(since, MAX_PAGE)
+                if not new_messages:
+                    yield ": keep-alive\n\n"
+                    continue
+                for msg in new_messages:
+                    yield f"id: {msg.id}\ndata: {json.dumps(msg.to_dict())}\n\n"
+                since = new_messages[-1].id
+
+        return Response(
+            events(max(since, 0)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    ROUTES = [
+        ("/", "index", ["GET"]),
+        ("/public_key", "public_key", ["GET"]),
+        ("/peers", "list_peers", ["GET", "POST"]),
+        ("/register_webhook", "register_webhook", ["POST"]),
+        ("/webhook_callback", "webhook_callback", ["POST"]),
+        ("/handshake", "handshake", ["POST"]),
+        ("/init_handshake", "init_handshake", ["POST"]),
+        ("/send", "send", ["POST"]),
+        ("/send_batch", "send_batch", ["POST"]),
+        ("/send_file", "send_file", ["POST"]),
+        ("/receive", "receive", ["POST"]),
+        ("/receive_batch", "receive_batch", ["POST"]),
+        ("/receive_stream", "receive_stream", ["POST"]),
+        ("/attachments/<name>", "attachment", ["GET"]),
+        ("/stats", "stats", ["GET"]),
+        ("/metrics", "prometheus_metrics", ["GET"]),
+        ("/messages", "get_messages", ["GET"]),
+        ("/stream", "stream", ["GET"]),
+    ]
+
+
+def create_app(node_id, name, port, peers=(), **options):
+    """Cria a aplicação Flask de um nó; `peers` é uma lista de Peer."""
+    app = Flask(__name__, template_folder="templates")
+    app.config["MAX_CONTENT_LENGTH"] = MAX_BODY_BYTES
+    configure_logging()
+
+    @app.url_defaults
+    def version_static(endpoint, values):
+        # url_for('static', ...) ganha ?v=<hash do conteúdo>: cache longo sem servir CSS velho
+        if endpoint == "static" and "filename" in values:
+            values.setdefault("v", http_cache.static_version(app.static_folder, values["filename"]))
+
+    app.after_request(http_cache.cache_static)
+    app.after_request(http_cache.compress_response)
+    options.setdefault("instance_path", app.instance_path)
+    node = Node(node_id, name, port, peers, **options)
+    for rule, endpoint, methods in Node.ROUTES:
+        app.add_url_rule(rule, endpoint, getattr(node, endpoint), methods=methods)
+    app.extensions["chat_node"] = node
+    return app
+
+
+def parse_peer(value):
+    """Converte "id=http://host:porta" em Peer."""
+    peer_id, sep, base_url = value.partition("=")
+    if not sep or not is_valid_url(base_url):
+        raise argparse.ArgumentTypeError(f"parceiro inválido: {value!r} (use id=http://host:porta)")
+    return Peer(peer_id, base_url)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nó do chat RSA")
+    parser.add_argument("--id", required=True, help="ID do nó (ex.: carol)")
+    parser.add_argument("--name", help="Nome exibido (padrão: o ID)")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--peer", type=parse_peer, action="append", default=[],
+                        help="parceiro no formato id=http://host:porta (repetível)")
+    args = parser.parse_args()
+
+    app = create_app(args.id, args.name or args.id, args.port, args.peer)
+    app.run(port=args.port, threaded=True)
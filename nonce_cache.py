@@ -0,0 +1,43 @@
+import collections
+import threading
+import time
+
+
+class NonceCache:
+    """Nonces vistos nos últimos `ttl` segundos (detecção de repetição).
+
+    Com `state` (SharedState), um nonce usado num worker vale para todos.
+    """
+
+    def __init__(self, ttl=600, maxsize=100000, state=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.state = state
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._entries and next(iter(self._entries.values())) <= now:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, nonce):
+        if self.state is not None:
+            return self.state.get("nonces", nonce) is not None
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            return nonce in self._entries
+
+    def add(self, nonce):
+        """Registra o nonce; False se ele já tinha sido visto."""
+        if self.state is not None:
+            return self.state.add("nonces", nonce, ttl=self.ttl)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if nonce in self._entries:
+                return False
+            self._entries[nonce] = now + self.ttl
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return True
@@ -0,0 +1,155 @@
+import threading
+from urllib.parse import urlparse
+
+from rsa_utils import RSAEncryptor
+
+
+class Peer:
+    """Outro nó conhecido: endereço, webhook, chave pública e sessão de envio."""
+    __slots__ = (
+        "peer_id", "name", "base_url", "webhook_url",
+        "public_key", "encryptor", "outbound_session", "wire_format", "ticket", "lock",
+    )
+
+    def __init__(self, peer_id, base_url, name=None, webhook_url=None):
+        self.peer_id = peer_id
+        self.name = name or peer_id
+        self.base_url = base_url.rstrip("/")
+        self.webhook_url = webhook_url
+        self.public_key = None  # Chave confirmada no handshake
+        self.encryptor = None  # RSAEncryptor da chave acima
+        self.outbound_session = None  # SessionCipher criada por nós
+        self.wire_format = None  # Content-Type negociado para /receive (None = JSON)
+        self.ticket = None  # SessionTicket para retomar o handshake
+        self.lock = threading.Lock()  # Evita dois handshakes simultâneos
+
+    def bind_key(self, public_key):
+        """Associa a chave do parceiro; o cifrador (e seu memo) só muda se a chave mudar."""
+        if public_key is not None and (self.encryptor is None or self.encryptor.public_key != public_key):
+            self.encryptor = RSAEncryptor(*public_key)
+        self.public_key = public_key
+
+    @property
+    def key_url(self):
+        return self.url("/public_key")
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def serves(self, url):
+        """True se `url` aponta para o mesmo host:porta deste parceiro."""
+        return _netloc(url) == _netloc(self.base_url)
+
+    def to_record(self):
+        """Campos compartilhados entre workers (ver PeerRegistry)."""
+        return {"name": self.name, "base_url": self.base_url, "webhook_url": self.webhook_url}
+
+    def to_dict(self):
+        return {
+            "peer_id": self.peer_id,
+            "name": self.name,
+            "base_url": self.base_url,
+            "webhook_url": self.webhook_url,
+            "handshake": self.public_key is not None,
+            "session": self.outbound_session is not None,
+            "wire_format": self.wire_format or "json",
+        }
+
+
+def _netloc(url):
+    return urlparse(url).netloc.lower()
+
+
+class PeerRegistry:
+    """Parceiros indexados pelo ID do nó.
+
+    Com `state` (SharedState), endereço, nome e webhook dos parceiros são
+    compartilhados entre workers; chave, cifrador e sessão de envio
+    continuam locais (cada worker faz o próprio handshake).
+    """
+
+    def __init__(self, peers=(), state=None):
+        self._peers = {}
+        self._lock = threading.Lock()
+        self.state = state
+        for peer in peers:
+            if state is not None:
+                # O webhook registrado por outro worker vale mais que o da configuração
+                record = state.get("peers", peer.peer_id)
+                if record is not None and peer.webhook_url is None:
+                    peer.webhook_url = record["webhook_url"]
+            self.add(peer)
+
+    def __len__(self):
+        return len(self.all())
+
+    def add(self, peer):
+        with self._lock:
+            self._peers[peer.peer_id] = peer
+        self.save(peer)
+        return peer
+
+    def save(self, peer):
+        """Publica as mudanças de endereço/webhook de `peer` para os outros workers."""
+        if self.state is not None:
+            self.state.put("peers", peer.peer_id, peer.to_record())
+
+    def _sync(self, peer_id, record):
+        with self._lock:
+            peer = self._peers.get(peer_id)
+            if peer is None:
+                peer = self._peers[peer_id] = Peer(peer_id, record["base_url"], name=record["name"])
+            peer.name = record["name"]
+            peer.base_url = record["base_url"]
+            peer.webhook_url = record["webhook_url"]
+        return peer
+
+    def get(self, peer_id):
+        if self.state is not None:
+            record = self.state.get("peers", peer_id)
+            if record is not None:
+                return self._sync(peer_id, record)
+        return self._peers.get(peer_id)
+
+    def all(self):
+        if self.state is not None:
+            for peer_id, record in self.state.items("peers").items():
+                self._sync(peer_id, record)
+        with self._lock:
+            return list(self._peers.values())
+
+    def only(self):
+        """O único parceiro, no modo de dois nós; None se houver outro número."""
+        peers = self.all()
+        return peers[0] if len(peers) == 1 else None
+
+    def find_by_url(self, url):
+        """Parceiro cujo endereço (host:porta) é o mesmo de `url`."""
+        netloc = _netloc(url)
+        for peer in self.all():
+            if _netloc(peer.base_url) == netloc:
+                return peer
+        return None
+
+    def find_by_name(self, name):
+        for peer in self.all():
+            if peer.name == name:
+                return peer
+        return None
+
+    def resolve(self, peer_id=None, url=None, name=None):
+        """Identifica o remetente de uma requisição, do campo mais forte ao mais fraco.
+
+        Requisições de nós antigos não trazem peer_id; no modo de dois nós
+        elas são atribuídas ao único parceiro.
+        """
+        peer = None
+        if peer_id:
+            peer = self.get(peer_id)
+        if peer is None and url:
+            peer = self.find_by_url(url)
+        if peer is None and name:
+            peer = self.find_by_name(name)
+        if peer is None and not peer_id:
+            peer = self.only()
+        return peer
@@ -0,0 +1,346 @@
+import collections
+import hashlib
+import os
+import random
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from tracing import TRACE, logger, traced
+
+# Modo de criptografia em blocos (bytes UTF-8 agrupados pelo tamanho de n)
+BLOCK_MODE = "block"
+# Cabeçalho: tamanho da mensagem em bytes (big-endian), antes do padding
+HEADER_SIZE = 4
+
+
+class RSAPrivateKey:
+    """Chave privada com os parâmetros do Teorema Chinês do Resto (CRT).
+
+    Continua desempacotável como a tupla antiga: ``d, n = chave``.
+    """
+    __slots__ = ("d", "n", "p", "q", "dP", "dQ", "qInv")
+
+    def __init__(self, d, n, p, q):
+        self.d = d
+        self.n = n
+        self.p = p
+        self.q = q
+        self.dP = d % (p - 1)
+        self.dQ = d % (q - 1)
+        self.qInv = pow(q, -1, p)
+
+    def __iter__(self):
+        return iter((self.d, self.n))
+
+    def __getitem__(self, index):
+        return (self.d, self.n)[index]
+
+    def __repr__(self):
+        return f"RSAPrivateKey(n={self.n})"
+
+    def power(self, value):
+        """Calcula value^d mod n com duas exponenciações de meia largura."""
+        m1 = pow(value, self.dP, self.p)
+        m2 = pow(value, self.dQ, self.q)
+        h = (self.qInv * (m1 - m2)) % self.p
+        return m2 + h * self.q
+
+def private_pow(value, private_key):
+    """Operação com a chave privada; usa CRT quando disponível."""
+    if isinstance(private_key, RSAPrivateKey):
+        return private_key.power(value)
+    d, n = private_key
+    return pow(value, d, n)
+
+def private_pow_many(values, private_key):
+    """private_pow em cada valor, na ordem (versão sequencial)."""
+    return [private_pow(value, private_key) for value in values]
+
+
+# --- Funções RSA Aprimoradas ---
+def _small_primes(limit):
+    """Crivo de Eratóstenes simples para a etapa de peneira."""
+    flags = bytearray([1]) * limit
+    flags[0:2] = b"\x00\x00"
+    for i in range(2, int(limit ** 0.5) + 1):
+        if flags[i]:
+            flags[i * i::i] = bytes(len(range(i * i, limit, i)))
+    return [i for i, flag in enumerate(flags) if flag]
+
+# Primos pequenos usados para descartar candidatos antes do Miller-Rabin
+SMALL_PRIMES = _small_primes(2000)
+# Quantidade de candidatos ímpares peneirados de uma vez
+SIEVE_WINDOW = 4096
+# Tamanho padrão do módulo n (pode ser trocado por CHAT_KEY_BITS)
+DEFAULT_KEY_BITS = int(os.environ.get("CHAT_KEY_BITS", "2048"))
+# Menor módulo aceito: os textos assinados (handshake, webhook) têm de ser menores que n
+MIN_KEY_BITS = 1024
+
+def _miller_rabin(a, d, s, num):
+    """True se a base a NÃO prova que num é composto."""
+    x = pow(a, d, num)
+    if x == 1 or x == num - 1:
+        return True
+    for _ in range(s - 1):
+        x = pow(x, 2, num)
+        if x == num - 1:
+            return True
+    return False
+
+def is_prime(num, rounds=16):
+    """Verificação robusta de primalidade.
+
+    As bases fixas tornam o teste determinístico abaixo de 2^64; acima disso
+    são feitas mais `rounds` rodadas com bases aleatórias.
+    """
+    if num < 2:
+        return False
+    for i in [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37]:
+        if num % i == 0:
+            return num == i
+    d = num - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in [2, 325, 9375, 28178, 450775, 9780504, 1795265022]:
+        if a >= num:
+            continue
+        if not _miller_rabin(a, d, s, num):
+            return False
+    if num >= 1 << 64:
+        for _ in range(rounds):
+            if not _miller_rabin(random.randrange(2, num - 1), d, s, num):
+                return False
+    return True
+
+def generate_prime(min_value, max_value):
+    """Gera primos grandes com Miller-Rabin."""
+    while True:
+        p = random.randint(min_value, max_value)
+        if is_prime(p):
+            return p
+
+def generate_large_prime(bits, e=65537):
+    """Gera um primo de exatamente `bits` bits com p - 1 coprimo a e.
+
+    Cada janela de SIEVE_WINDOW ímpares consecutivos é peneirada pelos
+    SMALL_PRIMES; só os sobreviventes passam pelo Miller-Rabin.
+    """
+    if bits < 16:
+        raise ValueError("Use generate_prime para primos tão pequenos")
+    while True:
+        # Dois bits mais altos ligados: p * q terá exatamente a soma dos bits
+        start = secrets.randbits(bits) | (3 << (bits - 2)) | 1
+        sieve = bytearray(SIEVE_WINDOW)  # posição i representa start + 2*i
+        for sp in SMALL_PRIMES[1:]:
+            # menor i com start + 2*i ≡ 0 (mod sp)
+            first = (-(start % sp) * ((sp + 1) // 2)) % sp
+            if first < SIEVE_WINDOW:
+                sieve[first::sp] = b"\x01" * len(range(first, SIEVE_WINDOW, sp))
+        for i in range(SIEVE_WINDOW):
+            if sieve[i]:
+                continue
+            candidate = start + 2 * i
+            if candidate.bit_length() != bits:
+                break
+            if (candidate - 1) % e and is_prime(candidate):
+                return candidate
+
+def _generate_prime_pair(p_bits, q_bits, e, parallel):
+    """Busca p e q, em paralelo num pool de processos quando possível."""
+    if parallel:
+        try:
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                p_future = pool.submit(generate_large_prime, p_bits, e)
+                q_future = pool.submit(generate_large_prime, q_bits, e)
+                return p_future.result(), q_future.result()
+        except (OSError, BrokenProcessPool):
+            pass  # Sem suporte a processos: segue na busca sequencial
+    return generate_large_prime(p_bits, e), generate_large_prime(q_bits, e)
+
+@traced("keygen")
+def generate_rsa_keys(bits=None, parallel=True):
+    """Geração de chaves com verificação.
+
+    `bits` é o tamanho de n (padrão DEFAULT_KEY_BITS), no mínimo MIN_KEY_BITS.
+    """
+    if bits is None:
+        bits = DEFAULT_KEY_BITS
+    if bits < MIN_KEY_BITS:
+        raise ValueError(f"Chaves de {bits} bits não comportam as assinaturas (mínimo {MIN_KEY_BITS})")
+    e = 65537  # Padrão RSA
+    p, q = _generate_prime_pair((bits + 1) // 2, bits // 2, e, parallel)
+    if p == q:
+        return generate_rsa_keys(bits, parallel)
+    n = p * q
+    phi = (p-1)*(q-1)
+
+    try:
+        d = pow(e, -1, phi)
+    except ValueError:
+        return generate_rsa_keys(bits, parallel)  # Recursão se inválido
+
+    # Verificação final
+    if (e * d) % phi != 1:
+        return generate_rsa_keys(bits, parallel)
+
+    return (e, n), RSAPrivateKey(d, n, p, q)
+
+@traced("encrypt")
+def encrypt_rsa(message, e, n):
+    """Modo legado: uma exponenciação por caractere."""
+    trace = logger.isEnabledFor(TRACE)
+    encrypted = []
+    for char in message:
+        char_code = ord(char)
+        encrypted_num = pow(char_code, e, n)
+        if trace:
+            logger.log(TRACE, "Char: %s (ASCII: %d) → Criptografado: %d", char, char_code, encrypted_num)
+        encrypted.append(encrypted_num)
+    return encrypted
+
+@traced("decrypt")
+def decrypt_rsa(encrypted, private_key, pow_many=private_pow_many):
+    """Modo legado: uma exponenciação por caractere.
+
+    `pow_many(valores, chave)` faz as exponenciações (ex.: num pool de processos).
+    """
+    trace = logger.isEnabledFor(TRACE)
+    decrypted = []
+    for num, decrypted_num in zip(encrypted, pow_many(encrypted, private_key)):
+        if trace:
+            logger.log(TRACE, "Valor criptografado: %d → Descriptografado: %d (ASCII: %s)",
+                       num, decrypted_num, chr(decrypted_num))
+        decrypted.append(chr(decrypted_num))
+    return ''.join(decrypted)
+
+# --- Modo em blocos ---
+def block_size(n):
+    """Maior número de bytes cujo valor inteiro é sempre menor que n."""
+    size = (n.bit_length() - 1) // 8
+    if size < 1:
+        raise ValueError("Módulo pequeno demais para o modo em blocos")
+    return size
+
+def encrypt_bytes(data, e, n):
+    """Empacota bytes em blocos do tamanho de n e cifra cada bloco.
+
+    O primeiro bloco começa com um cabeçalho de HEADER_SIZE bytes com o
+    tamanho real dos dados; o último bloco é completado com zeros.
+    """
+    return [pow(block, e, n) for block in pack_blocks(data, block_size(n))]
+
+def pack_blocks(data, size):
+    """Cabeçalho + dados + padding, fatiados em inteiros de `size` bytes."""
+    payload = len(data).to_bytes(HEADER_SIZE, "big") + data
+    payload += b"\x00" * (-len(payload) % size)
+    return [int.from_bytes(payload[i:i + size], "big") for i in range(0, len(payload), size)]
+
+def decrypt_bytes(encrypted, private_key, pow_many=private_pow_many):
+    """Inverso de encrypt_bytes: decifra, concatena e remove o padding."""
+    size = block_size(private_key[1])
+    limit = 1 << (8 * size)
+    chunks = []
+    for value in pow_many(encrypted, private_key):
+        if value >= limit:
+            raise ValueError("Bloco fora do intervalo esperado")
+        chunks.append(value.to_bytes(size, "big"))
+    payload = b"".join(chunks)
+    if len(payload) < HEADER_SIZE:
+        raise ValueError("Cabeçalho ausente")
+    length = int.from_bytes(payload[:HEADER_SIZE], "big")
+    if length > len(payload) - HEADER_SIZE:
+        raise ValueError("Tamanho declarado maior que o conteúdo")
+    return payload[HEADER_SIZE:HEADER_SIZE + length]
+
+@traced("encrypt")
+def encrypt_blocks(message, e, n):
+    """Modo em blocos: cifra o texto UTF-8 com encrypt_bytes."""
+    return encrypt_bytes(message.encode("utf-8"), e, n)
+
+@traced("decrypt")
+def decrypt_blocks(encrypted, private_key, pow_many=private_pow_many):
+    """Inverso de encrypt_blocks."""
+    return decrypt_bytes(encrypted, private_key, pow_many).decode("utf-8")
+
+class RSAEncryptor:
+    """Cifrador para uma chave pública fixa (e, n), criado uma vez por parceiro.
+
+    Guarda num LRU limitado o texto cifrado de blocos já vistos: caracteres
+    no modo legado e blocos repetidos no modo em blocos. O RSA destes modos
+    é determinístico, então o memo não muda o resultado; com um padding
+    aleatório (`randomized=True`) cada bloco é único e o memo fica desligado.
+    Tabelas de janela fixa não ajudam aqui: e = 65537 já custa só 17
+    multiplicações modulares em pow().
+    """
+
+    def __init__(self, e, n, memo_size=4096, randomized=False):
+        self.e = e
+        self.n = n
+        self.size = block_size(n)
+        self.memo_size = 0 if randomized else memo_size
+        self._memo = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def public_key(self):
+        return (self.e, self.n)
+
+    def encrypt_int(self, value):
+        if not self.memo_size:
+            return pow(value, self.e, self.n)
+        with self._lock:
+            cached = self._memo.get(value)
+            if cached is not None:
+                self._memo.move_to_end(value)
+                self.hits += 1
+                return cached
+        encrypted = pow(value, self.e, self.n)
+        with self._lock:
+            self.misses += 1
+            self._memo[value] = encrypted
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return encrypted
+
+    @traced("encrypt")
+    def encrypt_rsa(self, message):
+        """Igual a encrypt_rsa(message, e, n)."""
+        return [self.encrypt_int(ord(char)) for char in message]
+
+    def encrypt_bytes(self, data):
+        """Igual a encrypt_bytes(data, e, n)."""
+        return [self.encrypt_int(block) for block in pack_blocks(data, self.size)]
+
+    @traced("encrypt")
+    def encrypt_blocks(self, message):
+        """Igual a encrypt_blocks(message, e, n)."""
+        return self.encrypt_bytes(message.encode("utf-8"))
+
+# --- Novas funções para autenticação ---
+@traced("sign")
+def sign_message(message, private_key):
+    """Assina uma mensagem com a chave privada RSA."""
+    value = int.from_bytes(message.encode(), 'big')
+    if value >= private_key[1]:
+        raise ValueError("Mensagem maior que o módulo da chave")
+    signature = private_pow(value, private_key)
+    return signature
+
+@traced("verify")
+def verify_signature(signature, message, public_key):
+    """Verifica uma assinatura com a chave pública RSA."""
+    e, n = public_key
+    decrypted_signature = pow(signature, e, n)
+    original_message = int.from_bytes(message.encode(), 'big')
+    return decrypted_signature == original_message
+
+def key_fingerprint(public_key):
+    """Impressão digital (SHA-256) de uma chave pública (e, n)."""
+    e, n = public_key
+    return hashlib.sha256(f"{e}:{n}".encode()).hexdigest()
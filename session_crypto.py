@@ -0,0 +1,232 @@
+import base64
+import collections
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+from tracing import traced
+
+# Modo de sessão: corpo cifrado com chave simétrica trocada no handshake
+SESSION_MODE = "session"
+KEY_SIZE = 32
+NONCE_SIZE = 16
+TAG_SIZE = 32
+# Validade (s) de uma sessão no estado compartilhado entre workers
+SESSION_TTL = 24 * 3600
+# Validade (s) de um ticket de retomada de handshake
+TICKET_TTL = int(os.environ.get("CHAT_TICKET_TTL", "3600"))
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _mac(key, *parts):
+    return hmac.digest(key, b"|".join(parts), "sha256")
+
+
+def _proof(secret, session_id, nonce, webhook_url):
+    return _mac(secret, b"proof", session_id.encode(), nonce, (webhook_url or "").encode())
+
+
+class SessionCipher:
+    """Cifra simétrica de uma sessão (só biblioteca padrão).
+
+    Fluxo de chave SHAKE-256(chave || nonce) em XOR com o texto, e
+    HMAC-SHA256 sobre id || nonce || texto cifrado (encrypt-then-MAC).
+    Cada mensagem usa um nonce aleatório; nenhuma operação RSA é feita.
+    """
+    __slots__ = ("session_id", "key", "peer_id", "_enc_key", "_mac_key")
+
+    def __init__(self, key, session_id, peer_id=None):
+        self.session_id = session_id
+        self.key = key
+        self.peer_id = peer_id  # Nó do outro lado da sessão (se conhecido)
+        self._enc_key = hmac.digest(key, b"chat-enc", "sha256")
+        self._mac_key = hmac.digest(key, b"chat-mac", "sha256")
+
+    @classmethod
+    def generate(cls):
+        return cls(os.urandom(KEY_SIZE), os.urandom(8).hex())
+
+    def _xor(self, nonce, data):
+        stream = hashlib.shake_256(self._enc_key + nonce).digest(len(data))
+        mixed = int.from_bytes(data, "big") ^ int.from_bytes(stream, "big")
+        return mixed.to_bytes(len(data), "big")
+
+    def _tag(self, nonce, ciphertext):
+        return hmac.digest(
+            self._mac_key, self.session_id.encode() + nonce + ciphertext, "sha256"
+        )
+
+    @traced("session_encrypt")
+    def encrypt(self, message):
+        """Retorna o corpo JSON de /receive para o texto `message`."""
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = self._xor(nonce, message.encode("utf-8"))
+        return {
+            "mode": SESSION_MODE,
+            "session_id": self.session_id,
+            "nonce": _b64(nonce),
+            "text": _b64(ciphertext),
+            "tag": _b64(self._tag(nonce, ciphertext)),
+        }
+
+    def _open(self, payload):
+        """(nonce, texto cifrado) de um corpo de encrypt(); levanta ValueError se o MAC não conferir."""
+        nonce = base64.b64decode(payload["nonce"])
+        ciphertext = base64.b64decode(payload["text"])
+        tag = base64.b64decode(payload["tag"])
+        if not hmac.compare_digest(tag, self._tag(nonce, ciphertext)):
+            raise ValueError("MAC inválido")
+        return nonce, ciphertext
+
+    def verify(self, payload):
+        """True se o corpo é desta sessão (o MAC confere), sem decifrar."""
+        try:
+            self._open(payload)
+        except (KeyError, TypeError, ValueError):
+            return False
+        return True
+
+    @traced("session_decrypt")
+    def decrypt(self, payload):
+        """Confere o MAC e decifra; levanta ValueError se não conferir."""
+        nonce, ciphertext = self._open(payload)
+        return self._xor(nonce, ciphertext).decode("utf-8")
+
+    def seal(self, nonce, data):
+        """Cifra bytes com um nonce dado por quem chama; retorna tag || texto cifrado.
+
+        Usado nos pedaços de um stream, cujo nonce codifica a posição.
+        """
+        ciphertext = self._xor(nonce, data)
+        return self._tag(nonce, ciphertext) + ciphertext
+
+    def unseal(self, nonce, sealed):
+        """Inverso de seal; levanta ValueError se o MAC não conferir."""
+        tag, ciphertext = sealed[:TAG_SIZE], sealed[TAG_SIZE:]
+        if not hmac.compare_digest(tag, self._tag(nonce, ciphertext)):
+            raise ValueError("MAC inválido")
+        return self._xor(nonce, ciphertext)
+
+
+class SessionTable:
+    """Sessões recebidas por ID; descarta as mais antigas acima de `maxsize`.
+
+    Com `state` (SharedState), a sessão criada num worker vale em todos:
+    a memória local vira um cache do estado compartilhado.
+    """
+
+    def __init__(self, maxsize=64, state=None):
+        self.maxsize = maxsize
+        self.state = state
+        self._sessions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, cipher):
+        with self._lock:
+            self._sessions[cipher.session_id] = cipher
+            self._sessions.move_to_end(cipher.session_id)
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+
+    def put(self, cipher):
+        self._remember(cipher)
+        if self.state is not None:
+            self.state.put("sessions", cipher.session_id, {
+                "key": _b64(cipher.key), "peer_id": cipher.peer_id,
+            }, ttl=SESSION_TTL)
+
+    def get(self, session_id):
+        with self._lock:
+            cipher = self._sessions.get(session_id)
+        if cipher is None and self.state is not None and isinstance(session_id, str):
+            record = self.state.get("sessions", session_id)
+            if record is not None:
+                cipher = SessionCipher(base64.b64decode(record["key"]), session_id, record["peer_id"])
+                self._remember(cipher)
+        return cipher
+
+
+class SessionTicket:
+    """Ticket guardado por quem iniciou o handshake, para retomá-lo depois.
+
+    `secret` é a chave da sessão do handshake completo: só os dois lados a
+    conhecem (ela foi cifrada com RSA), então só quem a tem prova a retomada.
+    """
+    __slots__ = ("ticket", "secret", "partner_key", "expires_at")
+
+    def __init__(self, ticket, secret, partner_key, expires_at):
+        self.ticket = ticket
+        self.secret = secret
+        self.partner_key = partner_key
+        self.expires_at = expires_at
+
+    @property
+    def valid(self):
+        return self.expires_at > time.time()
+
+    def resume_request(self, webhook_url=None):
+        """(sessão nova, campo "resume" do /handshake), sem nenhuma operação RSA."""
+        session_id = os.urandom(8).hex()
+        nonce = os.urandom(NONCE_SIZE)
+        session = SessionCipher(_mac(self.secret, b"resume", session_id.encode(), nonce), session_id)
+        return session, {
+            "ticket": self.ticket,
+            "session_id": session_id,
+            "nonce": _b64(nonce),
+            "proof": _b64(_proof(self.secret, session_id, nonce, webhook_url)),
+        }
+
+
+class TicketIssuer:
+    """Emite e confere tickets de retomada (lado que recebe o /handshake).
+
+    O ticket leva o resultado do handshake completo (parceiro, chave pública
+    dele, segredo da sessão), cifrado e autenticado com uma chave só deste
+    nó: nada fica guardado no servidor e conferir um ticket custa HMACs, sem
+    buscar a chave do parceiro nem exponenciação RSA.
+    """
+
+    def __init__(self, key, ttl=TICKET_TTL):
+        self._cipher = SessionCipher(key, "ticket")
+        self.ttl = ttl
+
+    def issue(self, peer_id, partner_key_url, partner_key, secret):
+        body = json.dumps({
+            "peer_id": peer_id,
+            "key_url": partner_key_url,
+            "e": partner_key[0],
+            "n": partner_key[1],
+            "secret": _b64(secret),
+            "expires_at": int(time.time()) + self.ttl,
+        })
+        sealed = self._cipher.encrypt(body)
+        return {field: sealed[field] for field in ("nonce", "text", "tag")}
+
+    def resume(self, fields, webhook_url=None):
+        """Confere ticket e prova de um pedido de retomada.
+
+        Retorna (conteúdo do ticket, SessionCipher da sessão nova); levanta
+        ValueError se o ticket for inválido ou expirado, ou se a prova não
+        conferir.
+        """
+        try:
+            data = json.loads(self._cipher.decrypt(fields["ticket"]))
+            secret = base64.b64decode(data["secret"])
+            nonce = base64.b64decode(fields["nonce"])
+            proof = base64.b64decode(fields["proof"])
+            session_id = str(fields["session_id"])
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Pedido de retomada malformado: {e}")
+        if data["expires_at"] <= time.time():
+            raise ValueError("Ticket expirado")
+        if not hmac.compare_digest(proof, _proof(secret, session_id, nonce, webhook_url)):
+            raise ValueError("Prova de retomada inválida")
+        data["partner_key"] = (data.pop("e"), data.pop("n"))
+        key = _mac(secret, b"resume", session_id.encode(), nonce)
+        return data, SessionCipher(key, session_id, data["peer_id"])
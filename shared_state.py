@@ -0,0 +1,84 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# A cada quantas gravações as entradas expiradas são apagadas
+PURGE_EVERY = 1000
+
+
+class SharedState:
+    """Estado compartilhado entre processos (workers) de um mesmo nó.
+
+    Tabela chave/valor em SQLite, separada por namespace, com expiração
+    opcional por entrada; os valores são gravados como JSON. Com um único
+    processo o nó não usa esta classe e mantém tudo em memória.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Guarda chaves de sessão: só o dono do processo lê
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " expires_at REAL, PRIMARY KEY (namespace, key))"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    @staticmethod
+    def _expiry(ttl):
+        return None if ttl is None else time.time() + ttl
+
+    def _written(self, now):
+        """Chamado dentro da transação de cada gravação."""
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self._db.execute("DELETE FROM state WHERE expires_at <= ?", (now,))
+
+    def get(self, namespace, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM state WHERE namespace = ? AND key = ?"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, namespace, key, value, ttl=None):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), self._expiry(ttl)),
+            )
+            self._written(time.time())
+
+    def add(self, namespace, key, value=True, ttl=None):
+        """Grava só se a chave não existir (ou tiver expirado); False se já existia."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM state WHERE namespace = ? AND key = ? AND expires_at <= ?",
+                (namespace, key, now),
+            )
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), self._expiry(ttl)),
+            )
+            self._written(now)
+        return cursor.rowcount == 1
+
+    def items(self, namespace):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, value FROM state WHERE namespace = ?"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time()),
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
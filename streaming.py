@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import struct
+
+from rsa_utils import BLOCK_MODE, decrypt_bytes, encrypt_bytes, private_pow_many
+from session_crypto import NONCE_SIZE, SESSION_MODE
+
+# Corpo de /receive_stream (anexos e mensagens grandes), enviado com
+# Transfer-Encoding: chunked e lido um quadro por vez:
+#
+#   u8 tipo | u32 tamanho | conteúdo
+#
+#   H  cabeçalho JSON: remetente, nome do arquivo, modo e, na sessão, o
+#      ID e o prefixo do nonce
+#   C  um pedaço cifrado: na sessão, tag || texto cifrado; em blocos, os
+#      inteiros RSA com a largura de n, em big-endian
+#   E  fecho JSON com quantidade de pedaços, bytes e SHA-256 do conteúdo
+#      (na sessão, cifrado e autenticado como mais um pedaço)
+#
+# Na sessão o nonce do pedaço i é prefixo || i: o MAC amarra cada pedaço à
+# sua posição, e o fecho autenticado denuncia um corpo truncado. Quem envia
+# e quem recebe têm um pedaço por vez na memória.
+CONTENT_TYPE = "application/vnd.chat.stream"
+CHUNK_SIZE = 64 * 1024
+# Maior quadro aceito na leitura (um pedaço cifrado com folga)
+MAX_FRAME = 1024 * 1024
+
+HEADER = b"H"
+CHUNK = b"C"
+END = b"E"
+
+_FRAME = struct.Struct(">cI")
+
+
+class StreamTooLarge(ValueError):
+    """O conteúdo passou do limite de bytes do receptor."""
+
+
+def _frame(kind, payload):
+    return _FRAME.pack(kind, len(payload)) + payload
+
+
+def _nonce(prefix, index):
+    return prefix + index.to_bytes(NONCE_SIZE - len(prefix), "big")
+
+
+def _width(n):
+    return (n.bit_length() + 7) // 8
+
+
+def iter_file(f, chunk_size=CHUNK_SIZE):
+    """Pedaços de até `chunk_size` bytes de um arquivo aberto em modo binário."""
+    return iter(lambda: f.read(chunk_size), b"")
+
+
+def encode(header, chunks, session=None, public_key=None):
+    """Gera o corpo de /receive_stream a partir dos pedaços em claro.
+
+    Cifra com a sessão, se houver, ou em blocos com `public_key`. É um
+    gerador: o requests o envia com Transfer-Encoding: chunked, cifrando
+    cada pedaço só quando o anterior já foi para a rede.
+    """
+    prefix = os.urandom(8)
+    header = dict(header, mode=SESSION_MODE if session is not None else BLOCK_MODE)
+    if session is not None:
+        header.update(session_id=session.session_id, prefix=prefix.hex())
+    yield _frame(HEADER, json.dumps(header).encode("utf-8"))
+
+    digest = hashlib.sha256()
+    count = size = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        digest.update(chunk)
+        size += len(chunk)
+        if session is not None:
+            payload = session.seal(_nonce(prefix, count), chunk)
+        else:
+            e, n = public_key
+            width = _width(n)
+            # Sem o memo do RSAEncryptor: blocos de arquivo quase nunca se repetem
+            payload = b"".join(value.to_bytes(width, "big") for value in encrypt_bytes(chunk, e, n))
+        yield _frame(CHUNK, payload)
+        count += 1
+
+    trailer = json.dumps({"chunks": count, "size": size, "sha256": digest.hexdigest()}).encode("utf-8")
+    yield _frame(END, session.seal(_nonce(prefix, count), trailer) if session is not None else trailer)
+
+
+class StreamReader:
+    """Lê um corpo de /receive_stream de um arquivo (ex.: request.stream).
+
+    O cabeçalho é lido na criação, para quem recebe escolher a sessão e
+    passar pelo controle de admissão antes de decifrar qualquer pedaço.
+    Levanta ValueError se o corpo estiver truncado ou malformado.
+    """
+
+    def __init__(self, stream, max_frame=MAX_FRAME):
+        self.stream = stream
+        self.max_frame = max_frame
+        kind, payload = self._next()
+        if kind != HEADER:
+            raise ValueError("Stream sem cabeçalho")
+        self.header = json.loads(payload)
+        if not isinstance(self.header, dict):
+            raise ValueError("Cabeçalho do stream inválido")
+        self.mode = self.header.get("mode")
+
+    def _read(self, size):
+        parts = []
+        while size:
+            data = self.stream.read(size)
+            if not data:
+                raise ValueError("Stream truncado")
+            parts.append(data)
+            size -= len(data)
+        return b"".join(parts)
+
+    def _next(self):
+        kind, size = _FRAME.unpack(self._read(_FRAME.size))
+        if size > self.max_frame:
+            raise ValueError(f"Quadro grande demais ({size} bytes)")
+        return kind, self._read(size)
+
+    def copy_to(self, sink, session=None, private_key=None, pow_many=private_pow_many, max_bytes=None):
+        """Decifra os pedaços em ordem, gravando em `sink`; retorna o fecho.
+
+        Na sessão o fecho é conferido pelo MAC; nos dois modos, contagem,
+        tamanho e SHA-256 precisam bater com o que foi gravado. Levanta
+        StreamTooLarge se o conteúdo passar de `max_bytes`.
+        """
+        if self.mode == SESSION_MODE:
+            prefix = bytes.fromhex(self.header.get("prefix", ""))
+            if len(prefix) != 8:
+                raise ValueError("Prefixo de nonce inválido")
+        elif self.mode == BLOCK_MODE:
+            width = _width(private_key[1])
+        else:
+            raise ValueError(f"Modo de stream desconhecido: {self.mode!r}")
+
+        digest = hashlib.sha256()
+        count = size = 0
+        while True:
+            kind, payload = self._next()
+            if kind == END:
+                break
+            if kind != CHUNK:
+                raise ValueError("Quadro inesperado no stream")
+            if self.mode == SESSION_MODE:
+                chunk = session.unseal(_nonce(prefix, count), payload)
+            else:
+                if not payload or len(payload) % width:
+                    raise ValueError("Pedaço com blocos incompletos")
+                values = [int.from_bytes(payload[i:i + width], "big") for i in range(0, len(payload), width)]
+                chunk = decrypt_bytes(values, private_key, pow_many)
+            if not chunk:
+                raise ValueError("Pedaço vazio no stream")  # Quadros sem conteúdo não contam no limite
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise StreamTooLarge(f"Conteúdo maior que {max_bytes} bytes")
+            digest.update(chunk)
+            sink.write(chunk)
+            count += 1
+
+        if self.mode == SESSION_MODE:
+            payload = session.unseal(_nonce(prefix, count), payload)
+        trailer = json.loads(payload)
+        if trailer != {"chunks": count, "size": size, "sha256": digest.hexdigest()}:
+            raise ValueError("Fecho do stream não confere com o conteúdo")
+        return trailer
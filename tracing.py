@@ -0,0 +1,103 @@
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Nível abaixo de DEBUG para a saída por caractere/bloco da criptografia
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+logger = logging.getLogger("chat")
+
+# Limites (em segundos) dos buckets do histograma de cada span
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def configure_logging(level=None):
+    """Configura o logger "chat" com o nível de CHAT_LOG_LEVEL (padrão INFO)."""
+    level = level or os.environ.get("CHAT_LOG_LEVEL", "INFO")
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logger.setLevel(logging.getLevelName(level.upper()) if isinstance(level, str) else level)
+
+
+class Metrics:
+    """Contagem, soma, máximo e histograma do tempo de cada span."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = {
+                    "count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * (len(BUCKETS) + 1)
+                }
+            stats["count"] += 1
+            stats["sum"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["buckets"][bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def reset(self):
+        """Zera todos os spans (usado pelos benchmarks entre seções)."""
+        with self._lock:
+            self._spans.clear()
+
+    def snapshot(self):
+        """Resumo por span em milissegundos (para /stats)."""
+        with self._lock:
+            return {
+                name: {
+                    "count": stats["count"],
+                    "avg_ms": stats["sum"] / stats["count"] * 1000,
+                    "max_ms": stats["max"] * 1000,
+                }
+                for name, stats in self._spans.items()
+            }
+
+    def prometheus(self):
+        """Exporta os histogramas no formato texto do Prometheus."""
+        lines = [
+            "# HELP chat_span_seconds Duração das operações de criptografia e HTTP",
+            "# TYPE chat_span_seconds histogram",
+        ]
+        with self._lock:
+            for name, stats in sorted(self._spans.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), stats["buckets"]):
+                    cumulative += count
+                    lines.append(f'chat_span_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'chat_span_seconds_sum{{span="{name}"}} {stats["sum"]}')
+                lines.append(f'chat_span_seconds_count{{span="{name}"}} {stats["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def span(name):
+    """Mede o bloco e registra a duração em `metrics` (e em DEBUG no log)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe(name, elapsed)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("span %s: %.3f ms", name, elapsed * 1000)
+
+
+def traced(name):
+    """Decorador equivalente a envolver a função em span(name)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
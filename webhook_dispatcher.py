@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+
+import http_client
+from tracing import logger
+
+
+class WebhookDispatcher:
+    """Entrega de webhooks fora do caminho da requisição.
+
+    Notificações que chegam em rajada (dentro de `linger` segundos) viram um
+    único POST em lote; falhas são repetidas com backoff exponencial.
+    `build_payload(events)` monta o corpo do lote (assinatura incluída).
+    """
+
+    def __init__(self, build_payload, linger=0.05, max_batch=50,
+                 max_attempts=4, backoff=0.5, max_queue=1000):
+        self.build_payload = build_payload
+        self.linger = linger
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._queue = queue.Queue(max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "queued": 0,
+            "delivered": 0,
+            "batches": 0,
+            "retries": 0,
+            "failed": 0,
+            "dropped": 0,
+            "last_latency_ms": None,
+            "max_latency_ms": 0.0,
+            "total_latency_ms": 0.0,
+        }
+
+    def notify(self, url, event):
+        """Enfileira um evento para `url`; nunca bloqueia a requisição."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((url, event, time.monotonic()))
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("queued")
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        delivered = stats.pop("delivered")
+        total = stats.pop("total_latency_ms")
+        stats["delivered"] = delivered
+        stats["avg_latency_ms"] = total / delivered if delivered else None
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="webhook-dispatcher", daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            by_url = {}
+            for url, event, enqueued_at in batch:
+                by_url.setdefault(url, []).append((event, enqueued_at))
+            for url, items in by_url.items():
+                self._deliver(url, items)
+
+    def _deliver(self, url, items):
+        payload = self.build_payload([event for event, _ in items])
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self._count("retries")
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                response = http_client.post(url, endpoint="webhook", json=payload)
+                if response.status_code == 200:
+                    break
+                logger.warning("Webhook retornou erro: %s", response.status_code)
+            except Exception as e:
+                logger.error("ERRO no webhook: %s", e)
+        else:
+            self._count("failed", len(items))
+            return
+
+        latency_ms = (time.monotonic() - items[0][1]) * 1000
+        with self._lock:
+            self._stats["delivered"] += len(items)
+            self._stats["batches"] += 1
+            self._stats["last_latency_ms"] = latency_ms
+            self._stats["max_latency_ms"] = max(self._stats["max_latency_ms"], latency_ms)
+            self._stats["total_latency_ms"] += latency_ms * len(items)
@@ -0,0 +1,87 @@
+import json
+import struct
+
+# Formato binário para corpos de /receive e /receive_batch, negociado no handshake.
+#
+#   MAGIC | u32 tamanho do cabeçalho | cabeçalho JSON | seções de blocos
+#
+# O cabeçalho é o corpo JSON de sempre, com cada lista de inteiros trocada
+# por {"$blocks": i}. A seção i é: u16 largura | u32 quantidade | inteiros
+# big-endian de `largura` bytes cada. Evita escrever e ler números RSA em
+# decimal, que é lento e quase dobra o tamanho em relação aos bytes.
+CONTENT_TYPE = "application/vnd.chat.blocks"
+MAGIC = b"CHB1"
+BLOCKS_KEY = "$blocks"
+
+_HEADER = struct.Struct(">I")
+_SECTION = struct.Struct(">HI")
+
+
+def _is_blocks(value):
+    return (
+        isinstance(value, list) and value
+        and all(type(item) is int and item >= 0 for item in value)
+    )
+
+
+def _extract(value, sections):
+    if _is_blocks(value):
+        sections.append(value)
+        return {BLOCKS_KEY: len(sections) - 1}
+    if isinstance(value, dict):
+        return {key: _extract(item, sections) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_extract(item, sections) for item in value]
+    return value
+
+
+def _restore(value, sections):
+    if isinstance(value, dict):
+        if len(value) == 1 and BLOCKS_KEY in value:
+            try:
+                return sections[value[BLOCKS_KEY]]
+            except (IndexError, TypeError):
+                raise ValueError("Referência a seção de blocos inexistente")
+        return {key: _restore(item, sections) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_restore(item, sections) for item in value]
+    return value
+
+
+def dumps(body):
+    """Serializa um corpo (dict como o do JSON) no formato binário."""
+    sections = []
+    header = json.dumps(_extract(body, sections), separators=(",", ":")).encode("utf-8")
+    parts = [MAGIC, _HEADER.pack(len(header)), header]
+    for values in sections:
+        width = max(1, (max(values).bit_length() + 7) // 8)
+        parts.append(_SECTION.pack(width, len(values)))
+        parts.extend(value.to_bytes(width, "big") for value in values)
+    return b"".join(parts)
+
+
+def loads(data):
+    """Inverso de dumps; levanta ValueError se o corpo estiver truncado ou malformado."""
+    view = memoryview(data)
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Formato binário desconhecido")
+    offset = len(MAGIC)
+    try:
+        header_size, = _HEADER.unpack_from(view, offset)
+        offset += _HEADER.size
+        header = json.loads(bytes(view[offset:offset + header_size]))
+        offset += header_size
+        sections = []
+        while offset < len(view):
+            width, count = _SECTION.unpack_from(view, offset)
+            offset += _SECTION.size
+            end = offset + width * count
+            if width == 0 or end > len(view):
+                raise ValueError("Seção de blocos truncada")
+            sections.append([
+                int.from_bytes(view[i:i + width], "big") for i in range(offset, end, width)
+            ])
+            offset = end
+    except struct.error:
+        raise ValueError("Corpo binário truncado")
+    return _restore(header, sections)
@@ -0,0 +1,31 @@
+"""Ponto de entrada de produção: fábrica para servidores WSGI com vários workers.
+
+    CHAT_NODE_ID=alice CHAT_PORT=5000 CHAT_PEERS=bob=http://localhost:5001 \\
+        gunicorn -w 4 -k gthread --threads 8 -b 0.0.0.0:5000 'wsgi:create_app()'
+
+    uvicorn --interface wsgi --factory --workers 4 --port 5000 wsgi:create_app
+
+Ao contrário de app1.py/app2.py (servidor de desenvolvimento, um processo),
+aqui cada worker é um processo: sessões, parceiros, webhooks e nonces vão
+para o estado compartilhado em instance/ (CHAT_SHARED_STATE=0 desliga).
+/stream e o long-poll seguram a conexão: use workers com threads.
+"""
+import os
+
+import node
+from node import parse_peer
+
+
+def create_app(node_id=None, name=None, port=None, peers=None, **options):
+    """Cria o app do nó; argumentos ausentes vêm das variáveis CHAT_*."""
+    node_id = node_id or os.environ["CHAT_NODE_ID"]
+    port = int(port or os.environ.get("CHAT_PORT", "5000"))
+    if peers is None:
+        peers = [parse_peer(value) for value in os.environ.get("CHAT_PEERS", "").split(",") if value]
+    options.setdefault("host", os.environ.get("CHAT_HOST", "localhost"))
+    options.setdefault("shared_state", os.environ.get("CHAT_SHARED_STATE", "1") != "0")
+    if os.environ.get("CHAT_INSTANCE_PATH"):
+        options.setdefault("instance_path", os.environ["CHAT_INSTANCE_PATH"])
+    return node.create_app(
+        node_id, name or os.environ.get("CHAT_NODE_NAME", node_id), port, peers, **options
+    )